@@ -0,0 +1,76 @@
+""" Throughput of ShardedCrawler against one client hydrating users.
+
+    The fake server runs in a process of its own so it does not compete
+    with the client for the GIL. Workers return only the number of users
+    in each batch (a handler), as a real crawl writing shards to disk
+    would, so the parent is not the bottleneck.
+
+    Usage: python benchmarks/bench_crawler.py [users] [latency]
+
+    With latency 0 every process is CPU bound and the speedup is capped
+    by the number of cores, shared with the server process; with some
+    latency (e.g. 0.02) workers also overlap their waits.
+"""
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from birbapi.birbapi import Twitter
+from birbapi.crawler import ShardedCrawler
+from birbapi.fakeserver import FakeTwitterServer
+
+CREDENTIALS = [('key', 'secret', 'token', 'tokensecret')]
+
+
+def serve(latency, roots, stop):
+    with FakeTwitterServer(latency=latency, limits=False) as server:
+        roots.put(server.root)
+        stop.wait()
+
+
+def count_users(unit, users):
+    return len(users)
+
+
+def single(root, user_ids):
+    with Twitter(*CREDENTIALS[0], api_root=root) as twitter:
+        return sum(1 for _ in twitter.hydrate_users(user_ids, workers=1))
+
+
+def sharded(root, user_ids, processes):
+    with ShardedCrawler(CREDENTIALS, processes=processes, handler=count_users, api_root=root) as crawler:
+        # warm up: start-up cost is not what is measured
+        sum(crawler.hydrate(range(1, processes * 100 + 1)))
+        start = time.perf_counter()
+        count = sum(crawler.hydrate(user_ids))
+        return count, time.perf_counter() - start
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+    roots, stop = multiprocessing.Queue(), multiprocessing.Event()
+    server = multiprocessing.Process(target=serve, args=(latency, roots, stop), daemon=True)
+    server.start()
+    root = roots.get()
+    user_ids = range(1, users + 1)
+    print('%d cores, %d users, %.3fs latency' % (os.cpu_count(), users, latency))
+    try:
+        start = time.perf_counter()
+        count = single(root, user_ids)
+        baseline = time.perf_counter() - start
+        print('%-22s %8.0f users/s' % ('Twitter.hydrate_users', count / baseline))
+        for processes in (1, 2, 4, 8):
+            count, elapsed = sharded(root, user_ids, processes)
+            print('%-22s %8.0f users/s  %4.2fx' % ('%d processes' % processes, count / elapsed,
+                    baseline / elapsed))
+    finally:
+        stop.set()
+        server.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+""" Compare JSON decoders over recorded-style payloads, plus the ids-only
+    fast path used by the follower/friend pagers.
+
+    Usage: python benchmarks/bench_decoding.py
+"""
+import os
+import sys
+import json
+import timeit
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from birbapi.decoding import DECODERS, get_decoder, decode_ids
+
+
+def ids_payload():
+    ids = [10 ** 17 + i * 7919 for i in range(5000)]
+    return json.dumps({ 'ids' : ids, 'next_cursor' : 1510, 'next_cursor_str' : '1510',
+            'previous_cursor' : 0, 'previous_cursor_str' : '0' }).encode()
+
+
+def user(i):
+    return { 'id' : i, 'id_str' : str(i), 'name' : 'Birb %d' % i, 'screen_name' : 'birb%d' % i,
+            'location' : 'Nest', 'description' : 'Sings at dawn. ' * 8, 'followers_count' : 120,
+            'friends_count' : 80, 'statuses_count' : 4000, 'created_at' : 'Wed Aug 27 13:08:45 +0000 2008',
+            'entities' : { 'description' : { 'urls' : [] } }, 'protected' : False, 'verified' : False,
+            'profile_image_url_https' : 'https://pbs.twimg.com/profile_images/%d/a.jpg' % i }
+
+
+def search_payload():
+    statuses = [{ 'id' : 10 ** 18 + i, 'id_str' : str(10 ** 18 + i), 'text' : 'tweet %d #birbs' % i,
+            'created_at' : 'Wed Aug 27 13:08:45 +0000 2008', 'user' : user(i), 'lang' : 'en',
+            'entities' : { 'hashtags' : [{ 'text' : 'birbs', 'indices' : [9, 15] }] }}
+            for i in range(100)]
+    return json.dumps({ 'statuses' : statuses, 'search_metadata' : { 'count' : 100 } }).encode()
+
+
+def bench(label, func, number=200):
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print('%-34s %8.1f us' % (label, seconds * 1e6))
+
+
+def main():
+    payloads = (('friends/ids (5000 ids)', ids_payload()),
+                ('users/lookup (100 users)', json.dumps([user(i) for i in range(100)]).encode()),
+                ('search/tweets (100 tweets)', search_payload()))
+    for label, payload in payloads:
+        for name in DECODERS:
+            try:
+                decode = get_decoder(name)
+            except ImportError:
+                continue
+            bench('%s %s' % (label, name), lambda: decode(payload))
+            if payload is payloads[0][1]:
+                bench('%s %s + array' % (label, name), lambda: array('q', decode(payload)['ids']))
+                bench('%s %s decode_ids' % (label, name), lambda: decode_ids(payload, decode))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+""" Compare memory held per tweet as decoded dicts versus models.Tweet.
+
+    Usage: python benchmarks/bench_models.py [tweets]
+"""
+import os
+import sys
+import json
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from birbapi.models import Tweet
+
+
+def make_tweet(i):
+    user = { 'id' : i % 5000, 'id_str' : str(i % 5000), 'screen_name' : 'birb%d' % i, 'name' : 'Birb',
+            'description' : 'Sings at dawn. ' * 8, 'followers_count' : 120, 'friends_count' : 80,
+            'statuses_count' : 4000, 'created_at' : 'Wed Aug 27 13:08:45 +0000 2008',
+            'profile_image_url_https' : 'https://pbs.twimg.com/profile_images/%d/a.jpg' % i,
+            'entities' : { 'description' : { 'urls' : [] } }, 'protected' : False, 'verified' : False }
+    return { 'id' : 10 ** 18 + i, 'id_str' : str(10 ** 18 + i), 'created_at' : 'Wed Aug 27 13:08:45 +0000 2008',
+            'text' : 'tweet number %d #birbs https://t.co/abc' % i, 'user' : user, 'lang' : 'en',
+            'entities' : { 'hashtags' : [{ 'text' : 'birbs', 'indices' : [16, 22] }], 'urls' : [] },
+            'retweet_count' : i % 7, 'favorite_count' : i % 11, 'in_reply_to_status_id' : None }
+
+
+def measure(label, build, payload, count):
+    tracemalloc.start()
+    held = build(payload)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('%-22s %6d bytes/tweet' % (label, size / count))
+    return held
+
+
+def main(count=20000):
+    payload = json.dumps({ 'statuses' : [make_tweet(i) for i in range(count)] })
+    measure('dicts', lambda p: json.loads(p)['statuses'], payload, count)
+    measure('Tweet', lambda p: [Tweet.from_dict(s) for s in json.loads(p)['statuses']], payload, count)
+    measure('Tweet keep_raw', lambda p: [Tweet.from_dict(s, True) for s in json.loads(p)['statuses']],
+            payload, count)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,78 @@
+""" Per-call client overhead: what a Twitter endpoint method costs on top
+    of the HTTP exchange itself.
+
+    'adapter stub' rows mount a transport adapter that answers instantly,
+    so only client-side work is timed: URL and body encoding, OAuth1
+    signing, request preparation, retries/rate-limit bookkeeping and
+    hooks. 'fake server' rows add a real keep-alive round trip to the
+    local fake API. Each is compared with a plain requests.Session call
+    signed by requests_oauthlib, as the endpoint methods used to do.
+
+    Usage: python benchmarks/bench_overhead.py [calls]
+"""
+import os
+import sys
+import time
+
+import requests
+from requests.adapters import BaseAdapter
+from requests_oauthlib import OAuth1
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from birbapi.birbapi import Twitter
+from birbapi.fakeserver import FakeTwitterServer
+from birbapi.resource_urls import API_ROOT, USERS_SHOW
+
+
+class StubAdapter(BaseAdapter):
+    """ Answers every request with the same small JSON body """
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"id":12}'
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def timed(func, count):
+    for _ in range(min(count, 50)):
+        func()
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count
+
+
+def report(label, seconds):
+    print('%-36s %8.1f us' % (label, seconds * 1e6))
+
+
+def compare(label, root, count, mount=None):
+    twitter = Twitter('key', 'secret', 'token', 'tokensecret', api_root=root)
+    session = requests.Session()
+    oauth = OAuth1('key', client_secret='secret', resource_owner_key='token',
+            resource_owner_secret='tokensecret')
+    if mount is not None:
+        twitter.session.mount(root, mount)
+        session.mount(root, mount)
+    url = root + USERS_SHOW[len(API_ROOT):] + '?user_id=12'
+    with twitter, session:
+        report('%s: session.request + OAuth1' % label,
+                timed(lambda: session.request('GET', url, auth=oauth, timeout=10), count))
+        report('%s: Twitter.users_show' % label, timed(lambda: twitter.users_show(12), count))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    compare('adapter stub', 'http://stub.invalid', count, StubAdapter())
+    with FakeTwitterServer(limits=False) as server:
+        compare('fake server', server.root, count // 4)
+
+
+if __name__ == '__main__':
+    main()
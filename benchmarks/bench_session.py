@@ -0,0 +1,49 @@
+""" Compare per-request latency of the pooled session against one-shot
+    requests.get calls (a new connection per request).
+
+    Usage: python benchmarks/bench_session.py [requests]
+
+    The fake server speaks plain HTTP, so the gap shown here is only the
+    TCP setup; against api.twitter.com the TLS handshake widens it further.
+"""
+import os
+import sys
+import time
+import statistics
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from birbapi.birbapi import Twitter
+from birbapi.fakeserver import FakeTwitterServer
+from birbapi.resource_urls import API_ROOT, USERS_SHOW
+
+
+def timed(func, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print('%-18s mean %7.1f us  median %7.1f us  p99 %7.1f us' % (label,
+            statistics.mean(samples) * 1e6, statistics.median(samples) * 1e6, p99 * 1e6))
+
+
+def main(count=1000):
+    with FakeTwitterServer(limits=False) as server:
+        url = server.root + USERS_SHOW[len(API_ROOT):] + '?user_id=12'
+        twitter = Twitter('key', 'secret', 'token', 'tokensecret', api_root=server.root)
+        report('requests.get', timed(lambda: requests.get(url, auth=twitter.oauth, timeout=10), count))
+        with twitter:
+            report('pooled session', timed(lambda: twitter.users_show(12), count))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
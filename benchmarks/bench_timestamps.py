@@ -0,0 +1,40 @@
+""" Compare timestr_to_timestamp against the previous regex/strptime/mktime
+    implementation over a day's worth of created_at strings.
+
+    Usage: python benchmarks/bench_timestamps.py [strings]
+"""
+import os
+import re
+import sys
+import time
+import logging
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from birbapi.birbapi import timestr_to_timestamp, timestrs_to_timestamps
+
+
+def legacy_timestr_to_timestamp(created_at):
+    regex = re.compile(r'(\+|\-)\d\d\d\d')
+    match = regex.search(created_at)
+    if not match:
+        logging.warning('Twitter gave unsupported time string')
+        return time.time()
+    return time.mktime(time.strptime(created_at, '%a %b %d %H:%M:%S ' + match.group() + ' %Y'))
+
+
+def main(count=100000):
+    start = 1700000000
+    created_ats = [time.strftime('%a %b %d %H:%M:%S +0000 %Y', time.gmtime(start + i * 86400 // count))
+            for i in range(count)]
+
+    for label, func in (('legacy', lambda: [legacy_timestr_to_timestamp(s) for s in created_ats]),
+                        ('timestr_to_timestamp', lambda: [timestr_to_timestamp(s) for s in created_ats]),
+                        ('timestrs_to_timestamps', lambda: timestrs_to_timestamps(created_ats))):
+        seconds = min(timeit.repeat(func, number=1, repeat=3))
+        print('%-24s %8.0f ns/string' % (label, seconds / count * 1e9))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,122 @@
+""" End-to-end benchmarks of the Twitter client against the local fake
+    server: throughput, latency percentiles and peak memory for paging,
+    hydration, search, write actions and export. No network access needed.
+
+    Usage: python benchmarks/run.py [--latency 0.002] [--save baseline.json]
+                                    [--compare baseline.json] [scenario ...]
+
+    --save writes the results as JSON; --compare prints each metric's change
+    against such a file, so a feature branch can be checked against master.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from itertools import chain
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from birbapi.birbapi import Twitter
+from birbapi.actions import ActionQueue
+from birbapi.export import NDJSONWriter, export_followers
+from birbapi.fakeserver import FakeTwitterServer
+from birbapi.metrics import StatsAggregator
+
+
+def paging(twitter, size):
+    """ Walk every follower ID page """
+    return sum(len(page.ids) for page in twitter.iter_follower_ids(12))
+
+
+def hydration(twitter, size):
+    """ Page follower IDs straight into users/lookup """
+    ids = chain.from_iterable(page.ids for page in twitter.iter_follower_ids(12))
+    return sum(1 for _ in twitter.hydrate_users(ids, models=True))
+
+
+def search(twitter, size):
+    """ Walk search results back to the first tweet """
+    return sum(len(page) for page in twitter.iter_search('birbs', count=100, models=True))
+
+
+def actions(twitter, size):
+    """ Favorite tweets through the background queue, unpaced """
+    with ActionQueue(twitter, workers=4, interval=0) as queue:
+        futures = [queue.favorite(id) for id in range(1, size // 10 + 1)]
+    return sum(1 for future in futures if future.result().status_code == 200)
+
+
+def export(twitter, size):
+    """ Stream hydrated followers to a gzipped NDJSON file """
+    with tempfile.TemporaryDirectory() as directory:
+        with NDJSONWriter(os.path.join(directory, 'followers.ndjson.gz')) as writer:
+            return export_followers(twitter, 12, writer)
+
+
+SCENARIOS = { 'paging' : paging, 'hydration' : hydration, 'search' : search, 'actions' : actions,
+              'export' : export }
+
+
+def run(name, size, latency):
+    stats = StatsAggregator(window=100000)
+    with FakeTwitterServer(followers=size, tweets=size, latency=latency, limits=False) as server:
+        with Twitter('key', 'secret', 'token', 'tokensecret', api_root=server.root,
+                pool_maxsize=16, hooks=[stats]) as twitter:
+            tracemalloc.start()
+            started = time.perf_counter()
+            items = SCENARIOS[name](twitter, size)
+            seconds = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    summary = stats.summary()
+    calls = sum(resource['requests'] for resource in summary.values())
+    latencies = [resource for resource in summary.values() if resource['p50'] is not None]
+    return { 'items' : items, 'calls' : calls, 'seconds' : seconds,
+             'items_per_s' : items / seconds, 'calls_per_s' : calls / seconds,
+             'p50_ms' : max(resource['p50'] for resource in latencies) * 1000,
+             'p99_ms' : max(resource['p99'] for resource in latencies) * 1000,
+             'peak_kb' : peak / 1024 }
+
+
+METRICS = ('items_per_s', 'calls_per_s', 'p50_ms', 'p99_ms', 'peak_kb')
+
+
+def report(name, result, baseline=None):
+    line = '%-10s %6d items %5d calls' % (name, result['items'], result['calls'])
+    for metric in METRICS:
+        line += '  %s %9.1f' % (metric, result[metric])
+        if baseline is not None and baseline.get(metric):
+            line += ' (%+.0f%%)' % ((result[metric] / baseline[metric] - 1) * 100)
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('scenarios', nargs='*', help='any of %s (default all)' % ', '.join(SCENARIOS))
+    parser.add_argument('--size', type=int, default=20000, help='followers and tweets served')
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency in seconds')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='show changes against this JSON file')
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error('unknown scenario %r' % name)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    results = {}
+    for name in args.scenarios or SCENARIOS:
+        results[name] = run(name, args.size, args.latency)
+        report(name, results[name], baseline.get(name) if args.compare else None)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
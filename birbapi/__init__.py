@@ -1 +1,57 @@
-""" Main application package """
+""" Main application package
+
+    The names below are importable from birbapi directly, but each module
+    is only loaded when one of its names is first used, so e.g.
+    birbapi.timestr_to_timestamp costs neither the client nor requests.
+"""
+import importlib
+
+# name: module it is loaded from
+EXPORTS = {
+    'Twitter' : 'birbapi.birbapi',
+    'IDPage' : 'birbapi.birbapi',
+    'AsyncTwitter' : 'birbapi.aio',
+    'TwitterPool' : 'birbapi.pool',
+    'ShardedCrawler' : 'birbapi.crawler',
+    'TwitterError' : 'birbapi.errors',
+    'RequestsError' : 'birbapi.errors',
+    'RateLimiter' : 'birbapi.ratelimit',
+    'RateLimitExceeded' : 'birbapi.ratelimit',
+    'RetryPolicy' : 'birbapi.retry',
+    'ResponseCache' : 'birbapi.cache',
+    'MemoryCache' : 'birbapi.cache',
+    'SQLiteCache' : 'birbapi.cache',
+    'ActionQueue' : 'birbapi.actions',
+    'SearchWatermarks' : 'birbapi.search',
+    'SocialGraph' : 'birbapi.graph',
+    'NDJSONWriter' : 'birbapi.export',
+    'StatsAggregator' : 'birbapi.metrics',
+    'Tweet' : 'birbapi.models',
+    'User' : 'birbapi.models',
+    'Relationship' : 'birbapi.models',
+    'timestr_to_timestamp' : 'birbapi.timestamps',
+    'timestrs_to_timestamps' : 'birbapi.timestamps',
+    'API_ROOT' : 'birbapi.resource_urls',
+}
+
+__all__ = sorted(EXPORTS)
+
+
+def __getattr__(name):
+    module = EXPORTS.get(name)
+    if module is None:
+        # submodules, e.g. birbapi.birbapi.Twitter after a bare import birbapi
+        try:
+            return importlib.import_module('%s.%s' % (__name__, name))
+        except ModuleNotFoundError as e:
+            if e.name != '%s.%s' % (__name__, name):
+                raise
+            raise AttributeError('module %r has no attribute %r' % (__name__, name)) from None
+    value = getattr(importlib.import_module(module), name)
+    # later lookups find it in the module dict and skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(EXPORTS))
@@ -0,0 +1,233 @@
+""" Background queue for write actions: likes, follows and retweets """
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from birbapi.endpoints import ENDPOINTS
+
+
+# action name -> (Twitter method, coalescing group, opposite action)
+ACTIONS = {
+    'favorite' : ('favorites_create', 'favorite', 'unfavorite'),
+    'unfavorite' : ('favorites_destroy', 'favorite', 'favorite'),
+    'follow' : ('follow_user', 'follow', 'unfollow'),
+    'unfollow' : ('unfollow_user', 'follow', 'follow'),
+    'retweet' : ('retweet', 'retweet', None),
+    'destroy' : ('statuses_destroy', 'destroy', None),
+}
+
+# Default seconds between two actions of one group, from Twitter's
+# published write limits: 1000 likes and 400 follows a day, 300 tweets
+# and retweets per 3 hours. Deletes are not limited.
+WRITE_INTERVALS = {
+    'favorite' : 24 * 3600 / 1000,
+    'follow' : 24 * 3600 / 400,
+    'retweet' : 3 * 3600 / 300,
+    'destroy' : 0,
+}
+
+
+class Action():
+    __slots__ = ('name', 'target', 'order', 'future', 'cancelled')
+
+    def __init__(self, name, target, order):
+        self.name = name
+        self.target = target
+        self.order = order
+        self.future = Future()
+        self.cancelled = False
+
+
+class ActionQueue():
+    """ Runs write actions from a pool of worker threads, paced so they
+        stay under Twitter's write limits.
+
+        twitter: the Twitter client to act through
+        workers: number of worker threads
+        interval: minimum seconds between two actions of one group (likes,
+                  follows, retweets, deletes) across all workers; None for
+                  WRITE_INTERVALS, or 0 to only wait out rate limits
+
+        Each call (favorite, follow, retweet, ...) returns a Future
+        resolving to the response, or raising its TwitterError or
+        RequestsError. While still queued:
+          - repeats of the same action on the same target share one Future
+          - of contradictory pairs (follow then unfollow of one user,
+            favorite then unfavorite of one tweet) only the later action is
+            sent; the earlier one's Future is cancelled
+        Actions whose write bucket the client's RateLimiter knows to be
+        empty (e.g. after a 429) wait for its window to reset.
+
+        Each group has its own queue, and a free worker takes the oldest
+        action whose group is due, so a backlog of likes never holds up a
+        follow. Workers wait on the queue rather than sleeping with an
+        action in hand.
+    """
+    def __init__(self, twitter, workers=2, interval=None):
+        self.twitter = twitter
+        self.intervals = dict(WRITE_INTERVALS) if interval is None else \
+                dict.fromkeys(WRITE_INTERVALS, interval)
+        self.queues = { group : deque() for group in WRITE_INTERVALS }
+        self.pending = {}
+        self.condition = threading.Condition()
+        self.next_start = dict.fromkeys(WRITE_INTERVALS, 0)
+        self.submitted = 0
+        self.closed = False
+        self.counts = { 'submitted' : 0, 'deduplicated' : 0, 'coalesced' : 0,
+                'succeeded' : 0, 'failed' : 0 }
+        self.threads = [threading.Thread(target=self.work, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+
+    def favorite(self, id):
+        return self.submit('favorite', id)
+
+
+    def unfavorite(self, id):
+        return self.submit('unfavorite', id)
+
+
+    def follow(self, user_id):
+        return self.submit('follow', user_id)
+
+
+    def unfollow(self, user_id):
+        return self.submit('unfollow', user_id)
+
+
+    def retweet(self, id):
+        return self.submit('retweet', id)
+
+
+    def destroy(self, id):
+        return self.submit('destroy', id)
+
+
+    def submit(self, name, target):
+        """ Queue action name (a key of ACTIONS) on target, returning a Future """
+        _, group, opposite = ACTIONS[name]
+        key = (group, str(target))
+        with self.condition:
+            if self.closed:
+                raise RuntimeError('ActionQueue is closed')
+            self.counts['submitted'] += 1
+            queued = self.pending.get(key)
+            if queued is not None and queued.name == name:
+                self.counts['deduplicated'] += 1
+                return queued.future
+            action = Action(name, target, self.submitted)
+            self.submitted += 1
+            if queued is not None and queued.name == opposite:
+                # the later action decides the end state
+                queued.cancelled = True
+                queued.future.cancel()
+                self.counts['coalesced'] += 1
+            self.pending[key] = action
+            self.queues[group].append(action)
+            self.condition.notify()
+        return action.future
+
+
+    def work(self):
+        while True:
+            with self.condition:
+                while True:
+                    action, wait = self.next_action()
+                    if action is not None:
+                        break
+                    if wait is None and self.closed:
+                        return
+                    self.condition.wait(wait)
+                _, group, _ = ACTIONS[action.name]
+                del self.pending[(group, str(action.target))]
+            if not action.future.set_running_or_notify_cancel():
+                continue
+            self.run(action)
+
+
+    def next_action(self):
+        """ Take the oldest queued action whose group is due, returning
+            (action, None), or (None, seconds until one is due), or
+            (None, None) when nothing is queued. Call holding
+            self.condition. """
+        now = time.monotonic()
+        best = soonest = None
+        for group, queued in self.queues.items():
+            while queued and queued[0].cancelled:
+                queued.popleft()
+            if not queued:
+                continue
+            ready = self.ready_at(queued[0], now)
+            if ready <= now:
+                if best is None or queued[0].order < best[0].order:
+                    best = queued[0], group
+            elif soonest is None or ready < soonest:
+                soonest = ready
+        if best is None:
+            return None, (None if soonest is None else soonest - now)
+        action, group = best
+        self.queues[group].popleft()
+        self.next_start[group] = max(now, self.next_start[group]) + self.intervals[group]
+        return action, None
+
+
+    def ready_at(self, action, now):
+        """ When action's group interval has passed and its rate-limit
+            window, if known to be spent, has reset """
+        method, group, _ = ACTIONS[action.name]
+        ready = self.next_start[group]
+        resource = ENDPOINTS[method].resource
+        limiter = self.twitter.rate_limiter
+        if limiter.remaining(resource) == 0:
+            ready = max(ready, now + limiter.delay(resource))
+        return ready
+
+
+    def run(self, action):
+        """ Send one action; transient failures and 429s are already
+            retried by the client's RetryPolicy """
+        method = getattr(self.twitter, ACTIONS[action.name][0])
+        try:
+            response = method(action.target)
+        except Exception as e:
+            self.finish(action, error=e)
+        else:
+            self.finish(action, response=response)
+
+
+    def finish(self, action, response=None, error=None):
+        with self.condition:
+            self.counts['failed' if error is not None else 'succeeded'] += 1
+        if error is not None:
+            logging.warning('%s %s failed: %s', action.name, action.target, error)
+            action.future.set_exception(error)
+        else:
+            action.future.set_result(response)
+
+
+    def close(self, wait=True):
+        """ Stop accepting actions; workers finish what is queued first """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def stats(self):
+        with self.condition:
+            counts = dict(self.counts)
+            counts['queued'] = len(self.pending)
+        return counts
@@ -0,0 +1,316 @@
+""" asyncio interface to the Twitter API, built on aiohttp """
+import asyncio
+import json
+import logging
+import time
+from datetime import timedelta
+from ssl import SSLError
+
+from birbapi.endpoints import ENDPOINTS, FORM_CONTENT_TYPE, encode_params
+from birbapi.errors import TwitterError, RequestsError
+from birbapi.metrics import RequestEvent, fire, rate_limit_headers
+from birbapi.ratelimit import RateLimiter
+from birbapi.retry import RetryPolicy
+from birbapi.signing import OAuthSigner
+from birbapi.resource_urls import API_ROOT, resource_name
+
+try:
+    import aiohttp
+    import yarl
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+class AsyncResponse():
+    """ Fully-read response, exposing the parts of requests.Response that
+        callers and TwitterError rely on. """
+    def __init__(self, url, status_code, headers, content, elapsed=timedelta(0)):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.elapsed = elapsed
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncTwitter():
+    """ asyncio counterpart of birbapi.Twitter
+
+        Every endpoint method is a coroutine returning an AsyncResponse.
+        Requests share one aiohttp connection pool, and at most
+        max_concurrency of them are in flight at once, so a single event
+        loop can drive thousands of calls. Use 'async with' or await
+        close() to release the pool.
+
+        pool_maxsize: total connections kept open by the pool
+        pool_maxsize_per_host: connections kept open per host (0 = no limit)
+        max_concurrency: maximum requests in flight at once
+        keepalive_timeout: seconds an idle connection is kept open
+        rate_limiter: RateLimiter tracking x-rate-limit-* headers; the
+                      'wait' policy sleeps with asyncio instead of blocking
+        retry: RetryPolicy applied to every request
+        hooks: callables receiving a metrics.RequestEvent per request
+    """
+    def __init__(self, conkey, consec, otoken=None, osecret=None, verifier=None, timeout=10,
+            pool_maxsize=100, pool_maxsize_per_host=0, max_concurrency=100, keepalive_timeout=15,
+            api_root=None, rate_limiter=None, retry=None, hooks=None):
+        if aiohttp is None:
+            raise ImportError('AsyncTwitter requires the aiohttp package')
+        self.consumer_key = conkey
+        self.consumer_secret = consec
+        self.oauth_token = otoken
+        self.oauth_secret = osecret
+        self.verifier = verifier
+        self.timeout = timeout
+        self.api_root = api_root.rstrip('/') if api_root else None
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.hooks = list(hooks or [])
+        self.pool_maxsize = pool_maxsize
+        self.pool_maxsize_per_host = pool_maxsize_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.session = None
+
+        # configure OAuth1 depending on what arguments are present
+        if otoken is None or osecret is None:
+            self.signer = OAuthSigner(conkey, consec)
+        else:
+            self.signer = OAuthSigner(conkey, consec, otoken, osecret, verifier)
+
+
+    def build_session(self):
+        """ Create the aiohttp session and connection pool shared by every endpoint """
+        connector = aiohttp.TCPConnector(limit=self.pool_maxsize,
+                limit_per_host=self.pool_maxsize_per_host, keepalive_timeout=self.keepalive_timeout)
+        return aiohttp.ClientSession(connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+
+    async def close(self):
+        """ Release all pooled connections """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+    def sign(self, method, url, data=None):
+        """ Return (url, headers, body) for the request, signed with OAuth1 """
+        if isinstance(data, dict):
+            data = encode_params(data)
+        headers = { 'Authorization' : self.signer.authorization(method, url, data) }
+        if data:
+            headers['Content-Type'] = FORM_CONTENT_TYPE
+        return url, headers, data
+
+
+    async def _call(self, name, params=None, id=None):
+        """ Call the endpoint ENDPOINTS[name], as Twitter._call does """
+        endpoint = ENDPOINTS[name]
+        url, body = endpoint.build(params or {}, id)
+        response = await self._request(endpoint.method, url, data=body)
+        if response.status_code not in endpoint.ok:
+            raise TwitterError(response)
+        return response
+
+
+    async def _request(self, method, url, data=None):
+        """ Send a signed request through the shared pool and read the
+            reply, retrying transient failures per self.retry. Every call
+            is reported to self.hooks.
+
+            url: full URL with its query string already encoded
+            data: form body, as a dict or an encoded string
+        """
+        start = time.perf_counter()
+        resource = resource_name(url)
+        if self.api_root:
+            url = self.api_root + url[len(API_ROOT):]
+        idempotent = self.retry.idempotent(method, resource)
+        attempt = 0
+        try:
+            while True:
+                try:
+                    response = await self._send(method, url, resource, data)
+                except RequestsError as e:
+                    delay = self.retry.next_delay(attempt, idempotent, sent=not e.unsent)
+                    if delay is None:
+                        raise
+                else:
+                    delay = self.retry.next_delay(attempt, idempotent, response.status_code,
+                            response.headers)
+                    if delay is None:
+                        break
+                logging.info('Retrying %s %s in %.1fs', method, resource, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+        except Exception as e:
+            if self.hooks:
+                fire(self.hooks, RequestEvent(resource, method, total=time.perf_counter() - start,
+                        retries=attempt, error=e))
+            raise
+
+        if self.hooks:
+            fire(self.hooks, RequestEvent(resource, method, response.status_code, len(response.content),
+                    response.elapsed.total_seconds(), time.perf_counter() - start, attempt,
+                    rate_limit_headers(response.headers)))
+        return response
+
+
+    def add_hook(self, hook):
+        """ Call hook(RequestEvent) after every request """
+        self.hooks.append(hook)
+
+
+    async def _send(self, method, url, resource, data):
+        """ Send one request, waiting for or refusing it first if its
+            rate-limit bucket is empty """
+        delay = self.rate_limiter.reserve(resource)
+        while delay > 0:
+            logging.info('Rate limit reached for %s, sleeping %.0fs', resource, delay)
+            await asyncio.sleep(delay)
+            delay = self.rate_limiter.reserve(resource)
+
+        # sign per attempt: the nonce and timestamp must be fresh
+        url, headers, body = self.sign(method, url, data)
+        if self.session is None:
+            self.session = self.build_session()
+        async with self.semaphore:
+            sent = time.perf_counter()
+            try:
+                # the URL is already encoded as signed; keep yarl from requoting it
+                async with self.session.request(method, yarl.URL(url, encoded=True), headers=headers,
+                        data=body.encode() if body else None) as response:
+                    elapsed = timedelta(seconds=time.perf_counter() - sent)
+                    content = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError, SSLError) as e:
+                raise RequestsError(str(e) or e.__class__.__name__,
+                        isinstance(e, aiohttp.ClientConnectorError))
+        self.rate_limiter.update(resource, response.headers, response.status)
+        return AsyncResponse(url, response.status, response.headers, content, elapsed)
+
+
+    async def search_tweets(self, q, **kwargs):
+        """ GET search/tweets """
+        return await self._call('search_tweets', dict(kwargs, q=q))
+
+
+    async def favorites_create(self, id):
+        """ Add favorite specified by id """
+        return await self._call('favorites_create', { 'id' : id })
+
+
+    async def favorites_destroy(self, id):
+        """ Remove favorite specified by id """
+        return await self._call('favorites_destroy', { 'id' : id })
+
+
+    async def retweet(self, id):
+        """ Retweet the status specified by id """
+        return await self._call('retweet', id=id)
+
+
+    async def statuses_destroy(self, id):
+        """ Destroy the status or retweet specified by id """
+        return await self._call('statuses_destroy', id=id)
+
+
+    async def follow_user(self, user_id):
+        """ Follow the user specified by user_id """
+        return await self._call('follow_user', { 'user_id' : user_id })
+
+
+    async def unfollow_user(self, user_id):
+        """ Unfollow the user specified by user_id """
+        return await self._call('unfollow_user', { 'user_id' : user_id })
+
+
+    async def send_tweet(self, status, reply_to=None, trim_user=1):
+        """ Send the tweets.
+
+            status: the text of the status update
+            reply_to: the ID of an existing status being replied to (optional)
+            trim_user: don't return full user object if 1 or true (optional)
+        """
+        return await self._call('send_tweet',
+                { 'status' : status, 'in_reply_to_status_id' : reply_to, 'trim_user' : trim_user })
+
+
+    async def friends_ids(self, user_id, cursor=-1):
+        """ Return list of IDs of each user the specified user is following """
+        return await self._call('friends_ids', { 'user_id' : user_id, 'cursor' : cursor })
+
+
+    async def followers_ids(self, user_id, cursor=-1):
+        """ Return list of IDs of each user following the specified user """
+        return await self._call('followers_ids', { 'user_id' : user_id, 'cursor' : cursor })
+
+
+    async def oauth_request_token(self, callback_url):
+        """ Step 1/3 in Twitter auth process """
+        return await self._call('oauth_request_token', { 'oauth_callback' : callback_url })
+
+
+    async def oauth_access_token(self):
+        """ Step 3/3 in Twitter auth process """
+        return await self._call('oauth_access_token')
+
+
+    async def get_rate_limit_status(self, resources):
+        """ Return current rate limits for the specified resource families.
+            resources: string of comma-seperated resource families """
+        return await self._call('get_rate_limit_status', { 'resources' : resources })
+
+
+    async def get_rate_limit_status_all(self):
+        return await self.get_rate_limit_status('help,users,search,statuses')
+
+
+    async def friendships_show(self, source_id=None, target_id=None, source_name=None, target_name=None):
+        """ Return info about the relationship between two users """
+        if source_id and target_id:
+            argdict = { 'source_id' : source_id, 'target_id': target_id }
+        elif source_name and target_name:
+            argdict = { 'source_screen_name' : source_name, 'target_screen_name': target_name }
+        else:
+            logging.error('Creating argdict failed')
+            return None
+
+        return await self._call('friendships_show', argdict)
+
+
+    async def friendships_lookup(self, userlist):
+        """ Return the authenticated user's connections to up to 100 users """
+        if len(userlist) > 100:
+            raise ValueError('userlist length must be <= 100')
+
+        return await self._call('friendships_lookup',
+                { 'user_id' : ','.join(str(user_id) for user_id in userlist) })
+
+
+    async def users_show(self, user_id):
+        """ Return details on a single user specified by user_id """
+        return await self._call('users_show', { 'user_id' : user_id })
+
+
+    async def users_lookup(self, userlist, entities=False):
+        """ Return fully-hydrated user objects for up to 100 users per request """
+        if len(userlist) > 100:
+            raise ValueError('userlist length must be <= 100')
+
+        csv_list = ','.join(str(user_id) for user_id in userlist)
+        return await self._call('users_lookup', { 'user_id' : csv_list, 'include_entities' : entities })
@@ -1,65 +1,73 @@
-import requests
-from urllib.parse import quote_plus
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import lru_cache, partial
+import json
+import threading
 import time
-import re
 import logging
-from ssl import SSLError
-from requests_oauthlib import OAuth1
-from birbapi.resource_urls import SEARCH_TWEETS, FAVORITES_CREATE, FAVORITES_DESTROY, \
-    STATUSES_RETWEET, STATUSES_DESTROY, FRIENDSHIPS_CREATE, FRIENDSHIPS_DESTROY, STATUSES_UPDATE, \
-    FRIENDS_IDS, FOLLOWERS_IDS, USERS_LOOKUP, USERS_SHOW, FRIENDSHIPS_SHOW, RATE_LIMIT_STATUS, \
-    OAUTH_ACCESS_TOKEN, OAUTH_REQUEST_TOKEN
-
-
-def timestr_to_timestamp(created_at):
-    """ Convert a Twitter-supplied 'created_at' time field to a timestamp """
-    regex = re.compile(r'(\+|\-)\d\d\d\d')
-    match = regex.search(created_at)
-    if not match:
-        logging.warning('Twitter gave unsupported time string')
-        return time.time()
-    return time.mktime(time.strptime(created_at, '%a %b %d %H:%M:%S ' + match.group() + ' %Y'))
-
-
-class TwitterError(Exception):
-    def __init__(self, response):
-        self.response_raw = response
-        self.response    = response.json()
-        self.http_code   = response.status_code
-        self.error_msg   = self.get_msg()
-        self.error_code  = self.get_code()
-
-    def get_msg(self):
-        error_msg = 'Unknown Twitter Error'
-        if 'errors' in self.response:
-            if len(self.response['errors']) > 0:
-                if 'message' in self.response['errors'][0]:
-                    error_msg = self.response['errors'][0]['message']
-        return error_msg
-
-    def get_code(self):
-        error_code = 0
-        if 'errors' in self.response:
-            if len(self.response['errors']) > 0:
-                if 'code' in self.response['errors'][0]:
-                    error_code = self.response['errors'][0]['code']
-        return error_code
-
-
-class RequestsError(Exception):
-    def __init__(self, msg=None):
-        self.error_msg  = 'Requests Unknown/Catchall Error'
-        if msg:
-            self.error_msg = msg
-
-    def __str__(self):
-        return repr(self.error_msg)
-
+from birbapi.cache import account_key, build_response
+from birbapi.decoding import get_decoder, decode_ids
+from birbapi.endpoints import ENDPOINTS, FORM_CONTENT_TYPE, encode_params
+from birbapi.errors import TwitterError, RequestsError
+from birbapi.metrics import RequestEvent, fire, rate_limit_headers
+from birbapi.ratelimit import RateLimiter
+from birbapi.retry import RetryPolicy
+from birbapi.signing import OAuthSigner
+from birbapi.timestamps import timestr_to_timestamp, timestrs_to_timestamps
+from birbapi.models import Tweet, User, FOLLOWING, FOLLOWED_BY, connection_flags
+from birbapi.resource_urls import API_ROOT, SEARCH_TWEETS, FRIENDS_IDS, FOLLOWERS_IDS, USERS_LOOKUP, \
+    FRIENDSHIPS_LOOKUP, resource_name
+
+
+# One page of a cursored ids response; ids is a compact array('q')
+IDPage = namedtuple('IDPage', ['ids', 'next_cursor', 'previous_cursor'])
+
+
+@lru_cache(maxsize=None)
+def network_errors():
+    """ The exceptions session.send raises for network trouble. requests
+        (with urllib3 and ssl) is only imported once a session is built,
+        so this is looked up when such an error is caught. """
+    import requests
+    from ssl import SSLError
+    return (requests.exceptions.ConnectionError,
+            requests.exceptions.HTTPError,
+            requests.exceptions.Timeout,
+            requests.exceptions.RequestException,
+            requests.exceptions.URLRequired,
+            requests.exceptions.TooManyRedirects, SSLError)
 
 
 class Twitter():
-    """ A wrapper interface to the Twitter API """
-    def __init__(self, conkey, consec, otoken=None, osecret=None, verifier=None, timeout=10, testing=False):
+    """ A wrapper interface to the Twitter API
+
+        All endpoint methods share one pooled requests.Session, so repeated
+        calls reuse open keep-alive connections instead of paying a new
+        TCP+TLS handshake each time. Call close() when done, or use the
+        instance as a context manager. The session (and with it requests)
+        is created on first use, so making a client costs no imports.
+
+        Endpoint methods are thin wrappers over the endpoints.ENDPOINTS
+        table, and all go through one execution core (_call, _request,
+        _send) that applies caching, retries, rate limiting and hooks.
+
+        pool_connections: number of per-host connection pools to cache
+        pool_maxsize: maximum connections kept open per host
+        keep_alive: reuse connections between requests if true
+        max_retries: int or urllib3 Retry for connection-level retries
+        api_root: alternate scheme://host to send requests to (e.g. a stub)
+        rate_limiter: RateLimiter tracking x-rate-limit-* headers; pass one
+                      to share it between clients or to choose its policy
+        cache: ResponseCache for read endpoints (off by default)
+        retry: RetryPolicy applied to every request
+        decoder: JSON decoder used for response bodies: None picks the
+                 fastest installed (orjson, ujson, json), or pass a name
+                 or a callable taking bytes
+        hooks: callables receiving a metrics.RequestEvent per request
+    """
+    def __init__(self, conkey, consec, otoken=None, osecret=None, verifier=None, timeout=10, testing=False,
+            pool_connections=10, pool_maxsize=10, keep_alive=True, max_retries=0, api_root=None,
+            rate_limiter=None, cache=None, retry=None, decoder=None, hooks=None):
         self.consumer_key = conkey
         self.consumer_secret = consec
         self.oauth_token = otoken
@@ -67,24 +75,229 @@ class Twitter():
         self.verifier = verifier
         self.timeout = timeout
         self.testing = testing
-
-        # configure OAuth1 depending on what arguments are present
+        self.api_root = api_root.rstrip('/') if api_root else None
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.cache = cache
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.decode = get_decoder(decoder)
+        self.hooks = list(hooks or [])
+
+        # self.signer signs the client's own calls; self.oauth is for
+        # requests made directly through the session
         if otoken is None or osecret is None:
-            self.oauth = OAuth1(conkey, client_secret=consec)
-        elif verifier is not None:
-            self.oauth = OAuth1(conkey, client_secret=consec,
-                    resource_owner_key=otoken, resource_owner_secret=osecret,
-                    verifier=verifier)
+            self.signer = OAuthSigner(conkey, consec)
         else:
-            self.oauth = OAuth1(conkey, client_secret=consec,
-                    resource_owner_key=otoken, resource_owner_secret=osecret)
+            self.signer = OAuthSigner(conkey, consec, otoken, osecret, verifier)
+        self._oauth = None
+        self.account = account_key(conkey, otoken)
+
+        self.session_options = (pool_connections, pool_maxsize, keep_alive, max_retries)
+        self._session = None
+        # batch helpers make their first request from pool threads
+        self.building = threading.RLock()
+        self.prepared = {}
+        self.send_settings = {}
+
+
+    @property
+    def oauth(self):
+        """ requests_oauthlib OAuth1 auth configured from the credentials
+            present, made on first use """
+        if self._oauth is None:
+            with self.building:
+                if self._oauth is None:
+                    self._oauth = self.build_oauth()
+        return self._oauth
+
+
+    def build_oauth(self):
+        from requests_oauthlib import OAuth1
+        if self.oauth_token is None or self.oauth_secret is None:
+            return OAuth1(self.consumer_key, client_secret=self.consumer_secret)
+        if self.verifier is not None:
+            return OAuth1(self.consumer_key, client_secret=self.consumer_secret,
+                    resource_owner_key=self.oauth_token, resource_owner_secret=self.oauth_secret,
+                    verifier=self.verifier)
+        return OAuth1(self.consumer_key, client_secret=self.consumer_secret,
+                resource_owner_key=self.oauth_token, resource_owner_secret=self.oauth_secret)
+
+
+    @property
+    def session(self):
+        """ The pooled requests.Session, built once on first use """
+        if self._session is None:
+            with self.building:
+                if self._session is None:
+                    self._session = self.build_session(*self.session_options)
+        return self._session
+
+
+    def build_session(self, pool_connections, pool_maxsize, keep_alive, max_retries):
+        """ Create the connection-pooled session shared by every endpoint """
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        session.auth = self.oauth
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                max_retries=max_retries)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+
+    def close(self):
+        """ Release all pooled connections """
+        if self._session is not None:
+            self._session.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def _call(self, name, params=None, id=None):
+        """ Call the endpoint ENDPOINTS[name] with params (None values are
+            left out) and, for status endpoints, id. Raises TwitterError
+            unless the reply status is one the endpoint accepts. """
+        endpoint = ENDPOINTS[name]
+        url, body = endpoint.build(params or {}, id)
+        response = self._request(endpoint.method, url, data=body)
+        if response.status_code not in endpoint.ok:
+            raise TwitterError(response, self.decode)
+        return response
+
+
+    def _request(self, method, url, **kwargs):
+        """ Send a request through the shared session, retrying transient
+            failures per self.retry. Cacheable GETs are answered from the
+            cache when possible. Every call is reported to self.hooks.
+
+            url: full URL with its query string already encoded
+            data: form body, as a dict or an encoded string
+        """
+        start = time.perf_counter()
+        resource = resource_name(url)
+        cache_key = None
+        if self.cache is not None and method == 'GET' and self.cache.ttl(resource):
+            cache_key = self.cache.key(method, url, account=self.account)
+            cached = self.cache.get(cache_key, url)
+            if cached is not None:
+                if self.hooks:
+                    fire(self.hooks, RequestEvent(resource, method, cached.status_code,
+                            len(cached.content), total=time.perf_counter() - start, cached=True))
+                return cached
+
+        if self.api_root:
+            url = self.api_root + url[len(API_ROOT):]
+        kwargs.setdefault('timeout', self.timeout)
+        idempotent = self.retry.idempotent(method, resource)
+        attempt = 0
+        try:
+            while True:
+                try:
+                    response = self._send(method, url, resource, **kwargs)
+                except RequestsError as e:
+                    delay = self.retry.next_delay(attempt, idempotent, sent=not e.unsent)
+                    if delay is None:
+                        raise
+                else:
+                    delay = self.retry.next_delay(attempt, idempotent, response.status_code,
+                            response.headers)
+                    if delay is None:
+                        break
+                logging.info('Retrying %s %s in %.1fs', method, resource, delay)
+                time.sleep(delay)
+                attempt += 1
+        except Exception as e:
+            if self.hooks:
+                fire(self.hooks, RequestEvent(resource, method, total=time.perf_counter() - start,
+                        retries=attempt, error=e))
+            raise
+
+        if self.hooks:
+            fire(self.hooks, RequestEvent(resource, method, response.status_code, len(response.content),
+                    response.elapsed.total_seconds(), time.perf_counter() - start, attempt,
+                    rate_limit_headers(response.headers)))
+        if cache_key is not None:
+            self.cache.set(cache_key, resource, response)
+        return response
+
+
+    def add_hook(self, hook):
+        """ Call hook(RequestEvent) after every request, e.g. a
+            metrics.StatsAggregator or metrics.PrometheusHook """
+        self.hooks.append(hook)
+
+
+    def _send(self, method, url, resource, data=None, **kwargs):
+        """ Send one request, waiting for or refusing it first if its
+            rate-limit bucket is empty """
+        delay = self.rate_limiter.reserve(resource)
+        while delay > 0:
+            logging.info('Rate limit reached for %s, sleeping %.0fs', resource, delay)
+            time.sleep(delay)
+            delay = self.rate_limiter.reserve(resource)
+
+        # sign per attempt: the nonce and timestamp must be fresh
+        request = self._prepare(method, url, resource, data)
+        try:
+            response = self.session.send(request, **self._settings(url), **kwargs)
+        except network_errors() as e:
+            from requests.exceptions import ConnectTimeout
+            from urllib3.exceptions import NewConnectionError
+            unsent = isinstance(e, ConnectTimeout) or \
+                    isinstance(getattr(e.args[0] if e.args else None, 'reason', None), NewConnectionError)
+            raise RequestsError(str(e), unsent)
+        self.rate_limiter.update(resource, response.headers, response.status_code)
+        return response
+
+
+    def _prepare(self, method, url, resource=None, data=None):
+        """ Return a signed PreparedRequest. It is copied from a template
+            made once per endpoint with the session's headers and hooks
+            merged in, rather than prepared from scratch. """
+        if isinstance(data, dict):
+            data = encode_params(data)
+        # keyed by resource so status IDs in the path (retweet, destroy)
+        # share one template; oauth URLs have no resource but are fixed
+        key = (method, resource or url.partition('?')[0])
+        template = self.prepared.get(key)
+        if template is None:
+            from requests import Request
+            # the identity auth keeps the session's OAuth1 from signing the template
+            template = self.session.prepare_request(Request(method, url.partition('?')[0],
+                    auth=lambda request: request))
+            self.prepared[key] = template
+        request = template.copy()
+        request.url = url
+        if data:
+            request.body = data.encode()
+            request.headers['Content-Type'] = FORM_CONTENT_TYPE
+            request.headers['Content-Length'] = str(len(request.body))
+        request.headers['Authorization'] = self.signer.authorization(method, url, data)
+        return request
+
+
+    def _settings(self, url):
+        """ Return the proxy, TLS and streaming settings for url's host,
+            read from the environment once per host instead of per call """
+        host = url[:url.find('/', url.find('//') + 2)]
+        settings = self.send_settings.get(host)
+        if settings is None:
+            settings = self.send_settings[host] = self.session.merge_environment_settings(
+                    url, {}, None, None, None)
+        return settings
 
 
     def build_uri(self, args_dict):
-        uri = ''
-        for key, value in list(args_dict.items()):
-            uri = uri + '&' + '%s=%s' % (key, value)
-        return uri
+        """ Return args_dict as encoded '&key=value' pairs """
+        return '&' + encode_params(args_dict)
 
 
     def search_tweets(self, q, **kwargs):
@@ -95,135 +308,84 @@ class Twitter():
                       the Twitter API, such as:
                       lang='en', result_type='popular', count=25
         """
-        # TODO: implement since_id on subsequent searches to avoid dupes?
-
-        if 'lang' in kwargs:
-            if kwargs['lang'] is None:
-                del kwargs['lang']
-
-        query = quote_plus(q)
-        uri = self.build_uri(kwargs)
-        try:
-            response = requests.get(SEARCH_TWEETS + '?q=' + query + uri,
-                    auth=self.oauth, timeout=self.timeout)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+        # see iter_search for paging and since_id tracking
+        return self._call('search_tweets', dict(kwargs, q=q))
+
+
+    def iter_search(self, q, since_id=None, watermarks=None, max_pages=None, wait=True, models=False,
+            **kwargs):
+        """ Generate pages of statuses matching q, newest first, walking
+            max_id backwards until since_id is reached.
+
+            since_id: only return tweets newer than this ID
+            watermarks: SearchWatermarks remembering the newest ID per
+                        query; used when since_id is omitted, and advanced
+                        once a walk reaches the previous watermark
+            max_pages: stop after this many pages (the watermark is then
+                       left alone, so the gap is fetched next time)
+            wait: sleep through rate limits instead of raising
+            models: yield lists of compact models.Tweet instead of dicts
+            **kwargs: passed to search_tweets, e.g. count=100
+        """
+        if since_id is None and watermarks is not None:
+            since_id = watermarks.get(q)
+        newest = since_id
+        max_id = None
+        pages = 0
+        while True:
+            params = dict(kwargs)
+            if since_id is not None:
+                params['since_id'] = since_id
+            if max_id is not None:
+                params['max_id'] = max_id
+            if wait:
+                response = self._wait_on_rate_limit(SEARCH_TWEETS, self.search_tweets, q, **params)
+            else:
+                response = self.search_tweets(q, **params)
+            statuses = self.decode(response.content)['statuses']
+            if not statuses:
+                break
+            ids = [status['id'] for status in statuses]
+            if newest is None or max(ids) > newest:
+                newest = max(ids)
+            yield [Tweet.from_dict(status) for status in statuses] if models else statuses
+            max_id = min(ids) - 1
+            pages += 1
+            if max_pages is not None and pages >= max_pages:
+                return
+        if watermarks is not None:
+            watermarks.update(q, newest)
 
 
     def favorites_create(self, id):
         """ Add favorite specified by id """
-        try:
-            response = requests.post(FAVORITES_CREATE,
-                    data={ 'id' : id }, auth=self.oauth, timeout=self.timeout)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+        return self._call('favorites_create', { 'id' : id })
 
 
     def favorites_destroy(self, id):
         """ Remove favorite specified by id """
-        try:
-            response = requests.post(FAVORITES_DESTROY,
-                    data={ 'id' : id }, auth=self.oauth, timeout=self.timeout)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200 or response.status_code != 404:
-            raise TwitterError(response)
-        return response
+        # a 404 (not a favorite) is returned too, see ENDPOINTS
+        return self._call('favorites_destroy', { 'id' : id })
 
 
     def retweet(self, id):
         """ Retweet the status specified by id """
-        argdict = { 'trim_user' : 1 }
-        uri = self.build_uri(argdict)
-
-        try:
-            response = requests.post(STATUSES_RETWEET + str(id) + '.json' + '?' + uri,
-                    auth=self.oauth, timeout=self.timeout)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+        return self._call('retweet', id=id)
 
 
     def statuses_destroy(self, id):
         """ Destroy the status or retweet specified by id """
-        argdict = { 'trim_user' : 1 }
-        uri = self.build_uri(argdict)
-
-        try:
-            response = requests.post(STATUSES_DESTROY + str(id) + '.json' + '?' + uri,
-                    auth=self.oauth, timeout=self.timeout)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+        return self._call('statuses_destroy', id=id)
 
 
     def follow_user(self, user_id):
         """ Follow the user specified by user_id """
-        try:
-            response = requests.post(FRIENDSHIPS_CREATE,
-                    data={ 'user_id' : user_id }, auth=self.oauth, timeout=self.timeout)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+        return self._call('follow_user', { 'user_id' : user_id })
 
 
     def unfollow_user(self, user_id):
         """ Unfollow the user specified by user_id """
-        try:
-            response = requests.post(FRIENDSHIPS_DESTROY,
-                    data={ 'user_id' : user_id }, auth=self.oauth, timeout=self.timeout)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+        return self._call('unfollow_user', { 'user_id' : user_id })
 
 
     def send_tweet(self, status, reply_to=None, trim_user=1):
@@ -233,156 +395,124 @@ class Twitter():
             reply_to: the ID of an existing status being replied to (optional)
             trim_user: don't return full user object if 1 or true (optional)
         """
-        try:
-            if reply_to is None:
-                response = requests.post(STATUSES_UPDATE,
-                        data={ 'status' : status, 'trim_user' : trim_user }, auth=self.oauth,
-                        timeout=self.timeout)
-            else:
-                response = requests.post(STATUSES_UPDATE,
-                        data={ 'status' : status, 'in_reply_to_status_id' : reply_to, 'trim_user' : trim_user },
-                        auth=self.oauth, timeout=self.timeout)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+        return self._call('send_tweet',
+                { 'status' : status, 'in_reply_to_status_id' : reply_to, 'trim_user' : trim_user })
 
 
     def friends_ids(self, user_id, cursor=-1):
         """ Return list of IDs of each user the specified user is following
-            Should be called from get_friends_list. """
-        try:
-            response = requests.get(FRIENDS_IDS + '?user_id=' + user_id +
-                    '&cursor=' + str(cursor), auth=self.oauth, timeout=self.timeout)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+            Should be called from iter_friend_ids. """
+        return self._call('friends_ids', { 'user_id' : user_id, 'cursor' : cursor })
 
 
-    def get_friends_recursive(self, twitter_id, cursor=-1, friends_list=[]):
-        """ Recursive function to assemble a list of users the specified
-            user is following (friends).
-        """
-        if int(cursor) == 0 or len(friends_list) >= 75000:
-            return { 'friends' : friends_list, 'cursor' : cursor }
+    def iter_friend_ids(self, user_id, cursor=-1, wait=True):
+        """ Generate IDPages of the users the specified user is following.
 
-        response = self.friends_ids(twitter_id, cursor)
+            cursor: start from a saved IDPage.next_cursor to resume a crawl
+            wait: sleep through rate limits instead of raising
+        """
+        return self._iter_ids(self.friends_ids, FRIENDS_IDS, user_id, cursor, wait)
 
-        friends_json = response.json()
-        cursor = friends_json['next_cursor_str']
-        for id in friends_json['ids']:
-            friends_list.append(str(id))
 
-        return self.get_friends_recursive(twitter_id, cursor, friends_list)
+    def get_friends_recursive(self, twitter_id, cursor=-1, friends_list=None):
+        """ Assemble a list of up to 75000 users the specified user is
+            following (friends). Prefer iter_friend_ids for large accounts.
+        """
+        if friends_list is None:
+            friends_list = []
+        cursor = str(cursor)
+        if int(cursor) != 0 and len(friends_list) < 75000:
+            for page in self.iter_friend_ids(twitter_id, cursor, wait=False):
+                friends_list.extend(str(id) for id in page.ids)
+                cursor = str(page.next_cursor)
+                if len(friends_list) >= 75000:
+                    break
+        return { 'friends' : friends_list, 'cursor' : cursor }
 
 
     def followers_ids(self, user_id, cursor=-1):
-        """ Return list of IDs of each user the specified user is following.
-            Should only be called from get_followers_list.
+        """ Return list of IDs of each user following the specified user.
+            Should only be called from iter_follower_ids.
         """
-        try:
-            response = requests.get(FOLLOWERS_IDS + '?user_id=' + user_id +
-                    '&cursor=' + str(cursor), auth=self.oauth, timeout=self.timeout)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+        return self._call('followers_ids', { 'user_id' : user_id, 'cursor' : cursor })
 
 
-    def get_followers_recursive(self, twitter_id, cursor=-1, followers_list=[]):
-        """ Recursive function to assemble a list of users who follow the
-            specified user.
-        """
-        if int(cursor) == 0 or len(followers_list) >= 75000:
-            return { 'followers' : followers_list, 'cursor' : cursor }
+    def iter_follower_ids(self, user_id, cursor=-1, wait=True):
+        """ Generate IDPages of the users following the specified user.
 
-        response = self.followers_ids(twitter_id, cursor)
+            cursor: start from a saved IDPage.next_cursor to resume a crawl
+            wait: sleep through rate limits instead of raising
+        """
+        return self._iter_ids(self.followers_ids, FOLLOWERS_IDS, user_id, cursor, wait)
 
-        followers_json = response.json()
-        cursor = followers_json['next_cursor_str']
-        for id in followers_json['ids']:
-            followers_list.append(str(id))
 
-        return self.get_followers_recursive(twitter_id, cursor, followers_list)
+    def get_followers_recursive(self, twitter_id, cursor=-1, followers_list=None):
+        """ Assemble a list of up to 75000 users who follow the specified
+            user. Prefer iter_follower_ids for large accounts.
+        """
+        if followers_list is None:
+            followers_list = []
+        cursor = str(cursor)
+        if int(cursor) != 0 and len(followers_list) < 75000:
+            for page in self.iter_follower_ids(twitter_id, cursor, wait=False):
+                followers_list.extend(str(id) for id in page.ids)
+                cursor = str(page.next_cursor)
+                if len(followers_list) >= 75000:
+                    break
+        return { 'followers' : followers_list, 'cursor' : cursor }
+
+
+    def _iter_ids(self, fetch, url, user_id, cursor, wait):
+        """ Page through a cursored ids endpoint one response at a time,
+            holding only the current page in memory. Only the ids array
+            and cursors are decoded. """
+        cursor = int(cursor)
+        while cursor != 0:
+            if wait:
+                response = self._wait_on_rate_limit(url, fetch, user_id, cursor)
+            else:
+                response = fetch(user_id, cursor)
+            ids, cursor, previous_cursor = decode_ids(response.content, self.decode)
+            yield IDPage(ids, cursor, previous_cursor)
+
+
+    def _wait_on_rate_limit(self, url, func, *args, **kwargs):
+        """ Call func(*args, **kwargs), sleeping until url's rate-limit
+            window resets whenever the call is refused with a 429 """
+        resource = resource_name(url)
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except TwitterError as e:
+                if e.http_code != 429:
+                    raise
+                delay = self.rate_limiter.delay(resource)
+                logging.info('Rate limit reached for %s, sleeping %.0fs', resource, delay)
+                time.sleep(delay)
 
 
     def oauth_request_token(self, callback_url):
         """ Step 1/3 in Twitter auth process """
         try:
-            response = requests.post(url=OAUTH_REQUEST_TOKEN, auth=self.oauth,
-                    data={ 'oauth_callback' : callback_url })
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            print(response.status_code)
-            print(response.text)
-            raise TwitterError(response)
-        return response
+            return self._call('oauth_request_token', { 'oauth_callback' : callback_url })
+        except TwitterError as e:
+            logging.error('Request token failed: %s', e)
+            raise
 
 
     def oauth_access_token(self):
         """ Step 3/3 in Twitter auth process """
-        try:
-            response = requests.post(url=OAUTH_ACCESS_TOKEN, auth=self.oauth)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+        return self._call('oauth_access_token')
 
 
     def get_rate_limit_status(self, resources):
         """ Return current rate limits for the specified resource families.
             resources: string of comma-seperated resource families """
-        try:
-            response = requests.get(RATE_LIMIT_STATUS + '?resources=' + resources,
-                auth=self.oauth, timeout=self.timeout)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+        return self._call('get_rate_limit_status', { 'resources' : resources })
 
 
     def get_rate_limit_status_all(self):
-        uri = quote_plus('help,users,search,statuses')
-        response = requests.get(RATE_LIMIT_STATUS + '?resources=' + uri,
-                auth=self.oauth, timeout=self.timeout)
-        return response
+        return self.get_rate_limit_status('help,users,search,statuses')
 
 
     def friendships_show(self, source_id=None, target_id=None, source_name=None, target_name=None):
@@ -395,57 +525,182 @@ class Twitter():
             logging.error('Creating argdict failed')
             return None
 
-        uri = self.build_uri(argdict)
+        return self._call('friendships_show', argdict)
 
-        try:
-            response = requests.get(FRIENDSHIPS_SHOW + '?' + uri, auth=self.oauth,
-                    timeout=self.timeout)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+
+    def friendships_lookup(self, userlist):
+        """ Return the authenticated user's connections to up to 100 users """
+        if len(userlist) > 100:
+            raise ValueError("userlist length must be <= 100")
+
+        return self._call('friendships_lookup',
+                { 'user_id' : ','.join(str(user_id) for user_id in userlist) })
+
+
+    def relationships(self, target_ids, followers=None, friends=None, workers=4):
+        """ Return { target ID : flags } for the authenticated user's
+            relationship to each target, where flags is a bitmask of
+            models.FOLLOWING (you follow them) and models.FOLLOWED_BY
+            (they follow you).
+
+            followers, friends: the authenticated user's follower and friend
+                                IDs, e.g. graph.Snapshots or sets. Given
+                                both, every answer comes from them and no
+                                request is made; they are only as fresh as
+                                the snapshot.
+            workers: number of friendships/lookup batches, of 100 targets,
+                     fetched concurrently
+
+            Targets Twitter doesn't return (suspended, deleted) are left
+            out. Rate limits are waited out rather than raised.
+        """
+        if followers is not None and friends is not None:
+            flags = {}
+            for user_id in target_ids:
+                user_id = int(user_id)
+                flags[user_id] = ((FOLLOWING if user_id in friends else 0) |
+                                  (FOLLOWED_BY if user_id in followers else 0))
+            return flags
+
+        flags = {}
+        for pairs in self._run_batches(target_ids, self._lookup_relationships, workers):
+            flags.update(pairs)
+        return flags
+
+
+    def _lookup_relationships(self, batch):
+        """ Fetch one friendships/lookup batch as (ID, flags) pairs """
+        response = self._fetch_batch(FRIENDSHIPS_LOOKUP, self.friendships_lookup, batch)
+        if response is None:
+            return []
+        return [(user['id'], connection_flags(user['connections']))
+                for user in self.decode(response.content)]
 
 
     def users_show(self, user_id):
         """ Return details on a single user specified by user_id """
-        try:
-            response = requests.get(USERS_SHOW + '?user_id=' + str(user_id),
-                    auth=self.oauth, timeout=self.timeout)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+        return self._call('users_show', { 'user_id' : user_id })
 
 
     def users_lookup(self, userlist, entities=False):
-        """ Return fully-hydrated user objects for up to 100 users per request """
+        """ Return fully-hydrated user objects for up to 100 users per request.
+            With a cache, only users not already cached are requested. """
         if len(userlist) > 100:
-            raise Exception("userlist length must be <= 100")
+            raise ValueError("userlist length must be <= 100")
+
+        if self.cache is not None and self.cache.ttl('/users/lookup'):
+            return self._users_lookup_cached(userlist, entities)
 
         # convert list to a CSV string
-        csv_list = ','.join(userlist)
+        csv_list = ','.join(str(user_id) for user_id in userlist)
+        return self._call('users_lookup', { 'user_id' : csv_list, 'include_entities' : entities })
+
+
+    def _users_lookup_cached(self, userlist, entities):
+        """ Serve the cached part of a users/lookup batch and fetch the rest """
+        users, missing = self.cache.get_users(userlist, entities, self.account)
+        if missing:
+            try:
+                response = self._call('users_lookup',
+                        { 'user_id' : ','.join(str(user_id) for user_id in missing),
+                          'include_entities' : entities })
+            except TwitterError as e:
+                # 404: none of the missing users exist, but cached ones do
+                if e.http_code != 404 or not users:
+                    raise
+            else:
+                fetched = self.decode(response.content)
+                self.cache.set_users(fetched, entities, self.account)
+                if not users:
+                    return response
+                users.extend(fetched)
+        return build_response(USERS_LOOKUP, json.dumps(users).encode())
+
+
+    def hydrate_users(self, user_ids, entities=False, workers=4, ordered=True, models=False):
+        """ Generate hydrated user objects for any number of user IDs.
+
+            user_ids: any iterable of IDs, e.g.
+                      chain.from_iterable(page.ids for page in iter_follower_ids(...))
+            workers: number of users/lookup batches fetched concurrently
+            ordered: yield batches in input order if true, otherwise as
+                     they complete
+            models: yield compact models.User instead of dicts
+
+            IDs are deduplicated and sent 100 per request; only a bounded
+            number of batches are held in memory at once. Users Twitter
+            cannot return (suspended, deleted) are skipped. Rate limits
+            are waited out rather than raised.
+        """
+        fetch = partial(self._lookup_batch, entities=entities, ordered=ordered, models=models)
+        for users in self._run_batches(user_ids, fetch, workers, ordered):
+            yield from users
+
+
+    def _run_batches(self, user_ids, fetch, workers, ordered=False):
+        """ Generate fetch(batch) for deduplicated batches of 100 IDs, run
+            on workers threads with at most workers * 2 batches in memory.
+            Results come in input order if ordered, otherwise as they
+            complete. """
+        executor = ThreadPoolExecutor(max_workers=workers)
+        pending = deque()
         try:
-            response = requests.post(url=USERS_LOOKUP, auth=self.oauth,
-                    data={'user_id' : csv_list, 'include_entities' : entities})
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.Timeout,
-                requests.exceptions.RequestException,
-                requests.exceptions.URLRequired,
-                requests.exceptions.TooManyRedirects, SSLError) as e:
-            raise RequestsError(str(e))
-        if response.status_code != 200:
-            raise TwitterError(response)
-        return response
+            for batch in self._user_batches(user_ids):
+                pending.append(executor.submit(fetch, batch))
+                while len(pending) >= workers * 2:
+                    yield pending.popleft().result() if ordered else self._next_completed(pending)
+            while pending:
+                yield pending.popleft().result() if ordered else self._next_completed(pending)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+    def _user_batches(self, user_ids, size=100):
+        """ Split an iterable of IDs into deduplicated lists of up to size """
+        seen = set()
+        batch = []
+        for user_id in user_ids:
+            user_id = int(user_id)
+            if user_id in seen:
+                continue
+            seen.add(user_id)
+            batch.append(user_id)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+    def _lookup_batch(self, batch, entities, ordered, models=False):
+        """ Fetch one users/lookup batch, optionally in the order requested """
+        response = self._fetch_batch(USERS_LOOKUP, self.users_lookup, batch, entities)
+        if response is None:
+            return []
+        users = self.decode(response.content)
+        if ordered:
+            position = { user_id : index for index, user_id in enumerate(batch) }
+            users.sort(key=lambda user: position.get(user['id'], len(position)))
+        if models:
+            return [User.from_dict(user) for user in users]
+        return users
+
+
+    def _fetch_batch(self, url, method, batch, *args):
+        """ Return method(batch, *args), waiting out rate limits, or None
+            if the reply is a 404 """
+        try:
+            return self._wait_on_rate_limit(url, method, batch, *args)
+        except TwitterError as e:
+            # 404 means none of the batch could be found
+            if e.http_code == 404:
+                return None
+            raise
+
+
+    def _next_completed(self, pending):
+        """ Remove the first finished future from pending and return its result """
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        future = next(iter(done))
+        pending.remove(future)
+        return future.result()
@@ -0,0 +1,221 @@
+""" Opt-in response caching for read endpoints """
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+
+# Seconds to keep a response, per rate-limit resource name. Resources not
+# listed here are never cached. users/lookup is cached per user, so
+# overlapping batches share entries.
+DEFAULT_TTLS = {
+    '/users/show' : 300,
+    '/users/lookup' : 300,
+    '/friendships/show' : 300,
+    '/application/rate_limit_status' : 10,
+}
+
+
+class MemoryCache():
+    """ In-process LRU store bounded by entry count and total value bytes """
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, clock=time.time):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self.clock():
+                self._pop(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._pop(key)
+            self.entries[key] = (self.clock() + ttl, value)
+            self.size += len(value)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._pop(next(iter(self.entries)))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        _, value = self.entries.pop(key)
+        self.size -= len(value)
+
+
+class SQLiteCache():
+    """ On-disk LRU store that several worker processes can share """
+    def __init__(self, path, max_entries=1000000, clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.clock = clock
+        self.local = threading.local()
+        self.writes = 0
+        db = self._db()
+        with db:
+            db.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, '
+                    'expires REAL, accessed REAL, value BLOB)')
+            db.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+
+    def _db(self):
+        # sqlite connections can't be shared between threads; keep one each
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            import sqlite3
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self.local.db = db
+        return db
+
+    def get(self, key):
+        db = self._db()
+        now = self.clock()
+        row = db.execute('SELECT expires, value FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        with db:
+            if row[0] <= now:
+                db.execute('DELETE FROM cache WHERE key = ?', (key,))
+                return None
+            db.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return bytes(row[1])
+
+    def set(self, key, value, ttl):
+        db = self._db()
+        now = self.clock()
+        with db:
+            db.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                    (key, now + ttl, now, value))
+        self.writes += 1
+        # trim occasionally rather than counting rows on every write
+        if self.writes % 1000 == 0:
+            self.evict()
+
+    def evict(self):
+        """ Drop expired entries, then the least recently used over max_entries """
+        db = self._db()
+        with db:
+            db.execute('DELETE FROM cache WHERE expires <= ?', (self.clock(),))
+            db.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def clear(self):
+        db = self._db()
+        with db:
+            db.execute('DELETE FROM cache')
+
+
+def account_key(consumer_key, token=None):
+    """ Short stable ID for a set of credentials, used to keep cache
+        entries apart: rate limits and viewer-dependent fields such as
+        a user's 'following' differ per account """
+    return hashlib.sha1(('%s %s' % (consumer_key, token or '')).encode()).hexdigest()[:16]
+
+
+class ResponseCache():
+    """ Caches successful read responses for Twitter(cache=...).
+
+        backend: MemoryCache (default) or SQLiteCache
+        ttls: seconds to keep responses, keyed by resource name; see
+              DEFAULT_TTLS. Only resources listed are cached.
+
+        Entries are keyed by account (see account_key), so one cache or
+        SQLite file can be shared between clients of different accounts.
+    """
+    def __init__(self, backend=None, ttls=None):
+        self.backend = backend if backend is not None else MemoryCache()
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+
+    def ttl(self, resource):
+        return self.ttls.get(resource)
+
+
+    def key(self, method, url, data=None, account=''):
+        if data:
+            return '%s %s %s %s' % (account, method, url, urlencode(sorted(data.items())))
+        return '%s %s %s' % (account, method, url)
+
+
+    def get(self, key, url):
+        """ Return a cached Response for key, or None """
+        content = self.backend.get(key)
+        self._count(content is not None)
+        if content is None:
+            return None
+        return build_response(url, content)
+
+
+    def set(self, key, resource, response):
+        if response.status_code == 200:
+            self.backend.set(key, response.content, self.ttls[resource])
+
+
+    def get_users(self, user_ids, entities=False, account=''):
+        """ Split user_ids into ([cached user objects], [uncached IDs]) """
+        users = []
+        missing = []
+        for user_id in user_ids:
+            content = self.backend.get(self.user_key(user_id, entities, account))
+            self._count(content is not None)
+            if content is None:
+                missing.append(user_id)
+            else:
+                users.append(json.loads(content))
+        return users, missing
+
+
+    def set_users(self, users, entities=False, account=''):
+        ttl = self.ttls['/users/lookup']
+        for user in users:
+            self.backend.set(self.user_key(user['id'], entities, account), json.dumps(user).encode(), ttl)
+
+
+    def user_key(self, user_id, entities, account=''):
+        return '%s user %s %d' % (account, user_id, bool(entities))
+
+
+    def stats(self):
+        with self.lock:
+            return { 'hits' : self.hits, 'misses' : self.misses }
+
+
+    def _count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+def build_response(url, content, status_code=200):
+    """ Wrap cached bytes in a requests.Response like a live reply """
+    import requests
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = url
+    response._content = content
+    response.headers['Content-Type'] = 'application/json'
+    return response
@@ -0,0 +1,395 @@
+""" Sharded crawling across a pool of worker processes, each with its own
+    client, under one rate-limit budget shared between them """
+import logging
+import multiprocessing
+import queue
+import signal
+import time
+from array import array
+from collections import namedtuple
+
+from birbapi.birbapi import Twitter
+from birbapi.endpoints import ENDPOINTS
+from birbapi.ratelimit import RateLimiter, RateLimitBucket, WAIT
+
+
+# Resources tracked in the shared budget: everything the clients read
+SHARED_RESOURCES = tuple(sorted(set(endpoint.resource for endpoint in ENDPOINTS.values()
+        if endpoint.resource is not None and not endpoint.write)))
+
+# One completed work unit: result is what the handler returned, or None if
+# error (a string describing the exception) is set
+CrawlResult = namedtuple('CrawlResult', ['unit', 'result', 'error'])
+
+CrawlProgress = namedtuple('CrawlProgress', ['done', 'failed', 'in_flight', 'elapsed', 'units_per_second'])
+
+
+class SharedBuckets():
+    """ The bucket mapping of a RateLimiter, kept in shared memory so
+        every process spending one account's budget sees the same counts.
+
+        Each (account, resource) slot holds limit, remaining and reset;
+        a reset of 0 means unknown. Resources outside SHARED_RESOURCES
+        are tracked per process.
+    """
+    def __init__(self, values, account):
+        self.values = values
+        self.base = account * len(SHARED_RESOURCES) * 3
+        self.slots = { resource : self.base + i * 3 for i, resource in enumerate(SHARED_RESOURCES) }
+        self.local = {}
+
+    def get(self, resource):
+        slot = self.slots.get(resource)
+        if slot is None:
+            return self.local.get(resource)
+        if not self.values[slot + 2]:
+            return None
+        return SharedBucket(self.values, slot)
+
+    def __setitem__(self, resource, bucket):
+        slot = self.slots.get(resource)
+        if slot is None:
+            self.local[resource] = bucket
+            return
+        self.values[slot:slot + 3] = [bucket.limit, bucket.remaining, bucket.reset]
+
+    def __delitem__(self, resource):
+        slot = self.slots.get(resource)
+        if slot is None:
+            del self.local[resource]
+            return
+        self.values[slot:slot + 3] = [0, 0, 0]
+
+    def items(self):
+        for resource in SHARED_RESOURCES:
+            bucket = self.get(resource)
+            if bucket is not None:
+                yield resource, bucket
+        yield from self.local.items()
+
+
+class SharedBucket(RateLimitBucket):
+    """ A RateLimitBucket reading and writing its fields in shared memory """
+    __slots__ = ('values', 'slot')
+
+    def __init__(self, values, slot):
+        self.values = values
+        self.slot = slot
+
+    limit = property(lambda self: int(self.values[self.slot]),
+            lambda self, value: self.values.__setitem__(self.slot, value))
+    remaining = property(lambda self: int(self.values[self.slot + 1]),
+            lambda self, value: self.values.__setitem__(self.slot + 1, value))
+    reset = property(lambda self: self.values[self.slot + 2],
+            lambda self, value: self.values.__setitem__(self.slot + 2, value))
+
+
+class SharedRateBudget():
+    """ Rate-limit state for several accounts, shared between processes.
+        Create it in the parent and pass it to the workers, which each
+        build limiter(account) for their client. """
+    def __init__(self, accounts, context=multiprocessing):
+        self.values = context.RawArray('d', accounts * len(SHARED_RESOURCES) * 3)
+        self.lock = context.Lock()
+
+    def limiter(self, account, policy=WAIT, margin=1):
+        limiter = RateLimiter(policy, margin)
+        limiter.buckets = SharedBuckets(self.values, account)
+        limiter.lock = self.lock
+        return limiter
+
+
+def run_unit(twitter, unit):
+    """ Fetch one work unit:
+          ('hydrate', [user IDs])  - list of user dicts
+          ('followers', user_id)   - array('q') of follower IDs
+          ('friends', user_id)     - array('q') of friend IDs
+          ('search', q, kwargs)    - list of statuses, newest first
+    """
+    kind = unit[0]
+    if kind == 'hydrate':
+        return list(twitter.hydrate_users(unit[1], workers=1))
+    if kind in ('followers', 'friends'):
+        pages = twitter.iter_follower_ids(unit[1]) if kind == 'followers' else \
+                twitter.iter_friend_ids(unit[1])
+        ids = array('q')
+        for page in pages:
+            ids.extend(page.ids)
+        return ids
+    if kind == 'search':
+        statuses = []
+        for page in twitter.iter_search(unit[1], **(unit[2] if len(unit) > 2 else {})):
+            statuses.extend(page)
+        return statuses
+    raise ValueError('Unknown work unit: %r' % (kind,))
+
+
+class ResultChannel():
+    """ Carries results from the workers to the parent. Unlike with a
+        multiprocessing.Queue, a result is in the pipe by the time put()
+        returns, so once a worker stops holding a unit, the parent can
+        read that unit's result. """
+    def __init__(self, context):
+        self.reader, self.writer = context.Pipe(duplex=False)
+        self.lock = context.Lock()
+
+    def put(self, result):
+        with self.lock:
+            self.writer.send(result)
+
+    def get(self, timeout=None):
+        if not self.reader.poll(timeout):
+            raise queue.Empty
+        return self.reader.recv()
+
+
+def crawl_worker(credentials, account, twitter_kwargs, budget, handler, tasks, results, holding, slot,
+        skip_before, dispatch):
+    """ Worker process loop: run units from tasks until a None arrives.
+        holding[slot] is the number of the unit being run, or -1, so the
+        parent can tell which unit was lost if this process dies. Units
+        numbered below skip_before were abandoned and are not started;
+        dispatch guards both. """
+    # the parent decides when to stop; let it see Ctrl-C alone
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    with Twitter(*credentials, rate_limiter=budget.limiter(account), **twitter_kwargs) as twitter:
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            number, unit = task
+            with dispatch:
+                if number < skip_before.value:
+                    continue
+                holding[slot] = number
+            try:
+                result = run_unit(twitter, unit)
+                if handler is not None:
+                    result = handler(unit, result)
+            except Exception as e:
+                results.put((number, None, '%s: %s' % (e.__class__.__name__, e)))
+            else:
+                results.put((number, result, None))
+            holding[slot] = -1
+
+
+class ShardedCrawler():
+    """ Spreads work units over worker processes, so JSON decoding and
+        OAuth signing use every core instead of one.
+
+        credentials: list of (conkey, consec, otoken, osecret) tuples;
+                     worker n uses credentials[n % len(credentials)], and
+                     workers on the same account share its rate budget
+        processes: number of worker processes (default: CPU count)
+        handler: optional picklable function(unit, result) run in the
+                 worker, whose return value is sent back instead of the
+                 result, e.g. to write shards to disk and return a count
+                 rather than pickle every record to the parent
+        progress: optional function(CrawlProgress), called at most every
+                  progress_interval seconds while run() is going
+        **twitter_kwargs: passed to each worker's Twitter, e.g. api_root
+
+            with ShardedCrawler(credentials, processes=8) as crawler:
+                for users in crawler.hydrate(user_ids):
+                    ...
+
+        Rate limits are waited out. Ctrl-C, or leaving a run() early,
+        stops handing out units: queued units no worker has started are
+        added to .unfinished, for resume() to run later, and the rest of
+        the units iterable is left unconsumed. Units a worker had started
+        still finish, but their results are dropped. close() lets workers
+        finish the unit they hold and exit.
+
+        A worker that dies while running a unit (a crash, the OOM killer)
+        is replaced, and its unit is reported as a failed CrawlResult.
+    """
+    def __init__(self, credentials, processes=None, handler=None, progress=None, progress_interval=5,
+            context=None, **twitter_kwargs):
+        self.context = context or multiprocessing.get_context()
+        self.credentials = [tuple(credential) for credential in credentials]
+        self.processes = processes or self.context.cpu_count()
+        self.handler = handler
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.budget = SharedRateBudget(len(self.credentials), self.context)
+        self.tasks = self.context.Queue()
+        self.results = ResultChannel(self.context)
+        self.unfinished = []
+        self.counts = { 'done' : 0, 'failed' : 0 }
+        self.number = 0
+        self.twitter_kwargs = twitter_kwargs
+        self.holding = self.context.RawArray('q', [-1] * self.processes)
+        self.skip_before = self.context.RawValue('q', 0)
+        self.dispatch = self.context.Lock()
+        self.lost = []
+        self.workers = [self.start_worker(n) for n in range(self.processes)]
+
+
+    def start_worker(self, n):
+        account = n % len(self.credentials)
+        worker = self.context.Process(target=crawl_worker, daemon=True,
+                args=(self.credentials[account], account, self.twitter_kwargs, self.budget, self.handler,
+                      self.tasks, self.results, self.holding, n, self.skip_before, self.dispatch))
+        worker.start()
+        return worker
+
+
+    def run(self, units):
+        """ Generate a CrawlResult per unit, in completion order. At most
+            two units per worker are queued at once, so units may be a
+            lazy iterable of any length. """
+        units = iter(units)
+        in_flight = {}
+        start = last_report = time.monotonic()
+        try:
+            while True:
+                while len(in_flight) < self.processes * 2:
+                    unit = next(units, None)
+                    if unit is None:
+                        break
+                    in_flight[self.number] = unit
+                    self.tasks.put((self.number, unit))
+                    self.number += 1
+                if not in_flight:
+                    return
+                done, result, error = self.next_result()
+                if done not in in_flight:
+                    # left over from a run that was abandoned
+                    continue
+                unit = in_flight.pop(done)
+                self.counts['failed' if error is not None else 'done'] += 1
+                if error is not None:
+                    logging.warning('Crawl unit %r failed: %s', unit, error)
+                yield CrawlResult(unit, result, error)
+                now = time.monotonic()
+                if self.progress is not None and now - last_report >= self.progress_interval:
+                    last_report = now
+                    self.progress(self.report(len(in_flight), now - start))
+        except BaseException:
+            self.abandon(in_flight)
+            raise
+        finally:
+            if self.progress is not None:
+                self.progress(self.report(len(in_flight), time.monotonic() - start))
+
+
+    def abandon(self, in_flight):
+        """ Keep the queued units of in_flight from starting, and add
+            them to .unfinished """
+        with self.dispatch:
+            self.skip_before.value = self.number
+            held = set(self.holding)
+        # units neither held nor queued any more have finished
+        while True:
+            try:
+                in_flight.pop(self.results.get(0)[0], None)
+            except queue.Empty:
+                break
+        self.unfinished.extend(unit for number, unit in in_flight.items() if number not in held)
+
+
+    def resume(self):
+        """ run() the units in .unfinished, which is emptied """
+        units, self.unfinished = self.unfinished, []
+        return self.run(units)
+
+
+    def next_result(self):
+        """ Wait for the next result, failing if every worker has died """
+        while True:
+            if self.lost:
+                return self.lost.pop()
+            try:
+                return self.results.get(timeout=1)
+            except queue.Empty:
+                self.lost.extend(self.replace_dead_workers())
+                if not any(worker.is_alive() for worker in self.workers):
+                    raise RuntimeError('All crawler workers have exited')
+
+
+    def replace_dead_workers(self):
+        """ Restart workers that died running a unit, returning a failed
+            result for each such unit. Workers that died between units
+            (e.g. failing to start) are not restarted. """
+        failed = []
+        for n, worker in enumerate(self.workers):
+            number = self.holding[n]
+            if worker.is_alive() or number < 0:
+                continue
+            self.holding[n] = -1
+            failed.append((number, None, 'Worker exited with code %s' % worker.exitcode))
+            self.workers[n] = self.start_worker(n)
+        return failed
+
+
+    def report(self, in_flight, elapsed):
+        done = self.counts['done'] + self.counts['failed']
+        return CrawlProgress(self.counts['done'], self.counts['failed'], in_flight, elapsed,
+                done / elapsed if elapsed else 0.0)
+
+
+    def hydrate(self, user_ids, batch=100):
+        """ Generate lists of user dicts (or handler results) for user_ids,
+            batch IDs per unit, in completion order """
+        return self.results_of(self.run(('hydrate', ids) for ids in chunks(user_ids, batch)))
+
+
+    def follower_ids(self, user_ids):
+        """ Generate (user_id, array of follower IDs) for each user """
+        for result in self.run(('followers', user_id) for user_id in user_ids):
+            if result.error is None:
+                yield result.unit[1], result.result
+
+
+    def search(self, queries, **kwargs):
+        """ Generate (q, statuses) for each query; kwargs go to iter_search """
+        for result in self.run(('search', q, kwargs) for q in queries):
+            if result.error is None:
+                yield result.unit[1], result.result
+
+
+    def results_of(self, results):
+        for result in results:
+            if result.error is None:
+                yield result.result
+
+
+    def close(self, timeout=30):
+        """ Let each worker finish its current unit, then stop it, and
+            return .unfinished """
+        # units still queued were abandoned by run(), which recorded them
+        with self.dispatch:
+            self.skip_before.value = self.number
+        for _ in self.workers:
+            self.tasks.put(None)
+        deadline = time.monotonic() + timeout
+        while any(worker.is_alive() for worker in self.workers) and time.monotonic() < deadline:
+            # keep the pipe empty so no worker blocks sending a last result
+            try:
+                self.results.get(0.05)
+            except queue.Empty:
+                pass
+        for worker in self.workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+        return self.unfinished
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
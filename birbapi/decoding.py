@@ -0,0 +1,55 @@
+""" Pluggable JSON decoding, and a fast path for ids payloads """
+import json
+import re
+from array import array
+
+
+# Preferred decoders, fastest first
+DECODERS = ('orjson', 'ujson', 'json')
+
+NEXT_CURSOR = re.compile(rb'"next_cursor"\s*:\s*(-?\d+)')
+PREVIOUS_CURSOR = re.compile(rb'"previous_cursor"\s*:\s*(-?\d+)')
+
+
+def get_decoder(decoder=None):
+    """ Return a function decoding JSON bytes.
+
+        decoder: None to pick the fastest installed of orjson, ujson and
+                 the stdlib json; one of those names; or any callable
+                 taking bytes
+    """
+    if callable(decoder):
+        return decoder
+    for name in (DECODERS if decoder is None else (decoder,)):
+        if name not in DECODERS:
+            raise ValueError('Unknown JSON decoder: %r' % name)
+        try:
+            module = __import__(name)
+        except ImportError:
+            if decoder is not None:
+                raise
+            continue
+        return module.loads
+    return json.loads
+
+
+def decode_ids(content, decode=json.loads):
+    """ Return (array('q') of ids, next_cursor, previous_cursor) from a
+        friends/ids or followers/ids body.
+
+        Only the ids array itself goes through the decoder, and its values
+        are copied straight into the array; the cursors are read with a
+        regex. No dict for the whole body is built.
+    """
+    start = content.find(b'[', content.find(b'"ids"') + 1)
+    end = content.find(b']', start)
+    # Twitter puts the cursors after the ids; look there before rescanning
+    next_cursor = NEXT_CURSOR.search(content, end) or NEXT_CURSOR.search(content)
+    previous_cursor = PREVIOUS_CURSOR.search(content, end) or PREVIOUS_CURSOR.search(content)
+    if start == -1 or end == -1 or next_cursor is None or previous_cursor is None:
+        # unexpected layout; decode it properly
+        ids_json = decode(content)
+        return array('q', ids_json['ids']), ids_json['next_cursor'], ids_json['previous_cursor']
+    ids = array('q')
+    ids.fromlist(decode(content[start:end + 1]))
+    return ids, int(next_cursor.group(1)), int(previous_cursor.group(1))
@@ -0,0 +1,76 @@
+""" Declarative table of the REST endpoints the clients call """
+from birbapi.resource_urls import SEARCH_TWEETS, FAVORITES_CREATE, FAVORITES_DESTROY, STATUSES_RETWEET, \
+    STATUSES_DESTROY, FRIENDSHIPS_CREATE, FRIENDSHIPS_DESTROY, STATUSES_UPDATE, FRIENDS_IDS, \
+    FOLLOWERS_IDS, USERS_LOOKUP, USERS_SHOW, FRIENDSHIPS_SHOW, FRIENDSHIPS_LOOKUP, RATE_LIMIT_STATUS, \
+    OAUTH_ACCESS_TOKEN, OAUTH_REQUEST_TOKEN, resource_name, resource_family
+from birbapi.signing import escape
+
+
+FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+
+
+class Endpoint():
+    """ One REST endpoint, as used by the clients' shared execution core.
+
+        name: the client method calling it
+        method: 'GET' or 'POST'; GET parameters go in the query string,
+                POST parameters in a form body
+        url: resource URL; one ending in '/' takes a status ID, followed
+             by '.json'
+        defaults: parameters always sent unless overridden
+        write: true for endpoints that change account state
+        ok: statuses returned rather than raised as TwitterError
+    """
+    __slots__ = ('name', 'method', 'url', 'defaults', 'write', 'ok', 'resource', 'family')
+
+    def __init__(self, name, method, url, defaults=None, write=False, ok=(200,)):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.defaults = defaults or {}
+        self.write = write
+        self.ok = ok
+        self.resource = resource_name(url + '0.json' if url.endswith('/') else url)
+        self.family = resource_family(self.resource) if self.resource else 'oauth'
+
+    def build(self, params, id=None):
+        """ Return (url, body) for a call, with every value encoded """
+        if self.defaults:
+            params = dict(self.defaults, **params)
+        url = self.url if id is None else self.url + escape(id) + '.json'
+        encoded = encode_params(params)
+        if self.method == 'POST':
+            return url, encoded
+        return (url + '?' + encoded if encoded else url), None
+
+    def __repr__(self):
+        return '<Endpoint %s %s>' % (self.method, self.resource or self.url)
+
+
+def encode_params(params):
+    """ Return params as an encoded query string or form body, leaving
+        out parameters whose value is None """
+    return '&'.join(escape(key) + '=' + escape(value) for key, value in params.items()
+            if value is not None)
+
+
+ENDPOINTS = { endpoint.name : endpoint for endpoint in (
+    Endpoint('search_tweets', 'GET', SEARCH_TWEETS),
+    Endpoint('favorites_create', 'POST', FAVORITES_CREATE, write=True),
+    # 404: the status wasn't a favorite (or no longer exists)
+    Endpoint('favorites_destroy', 'POST', FAVORITES_DESTROY, write=True, ok=(200, 404)),
+    Endpoint('retweet', 'POST', STATUSES_RETWEET, { 'trim_user' : 1 }, write=True),
+    Endpoint('statuses_destroy', 'POST', STATUSES_DESTROY, { 'trim_user' : 1 }, write=True),
+    Endpoint('follow_user', 'POST', FRIENDSHIPS_CREATE, write=True),
+    Endpoint('unfollow_user', 'POST', FRIENDSHIPS_DESTROY, write=True),
+    Endpoint('send_tweet', 'POST', STATUSES_UPDATE, write=True),
+    Endpoint('friends_ids', 'GET', FRIENDS_IDS),
+    Endpoint('followers_ids', 'GET', FOLLOWERS_IDS),
+    Endpoint('friendships_show', 'GET', FRIENDSHIPS_SHOW),
+    Endpoint('friendships_lookup', 'GET', FRIENDSHIPS_LOOKUP),
+    Endpoint('users_show', 'GET', USERS_SHOW),
+    Endpoint('users_lookup', 'POST', USERS_LOOKUP),
+    Endpoint('get_rate_limit_status', 'GET', RATE_LIMIT_STATUS),
+    Endpoint('oauth_request_token', 'POST', OAUTH_REQUEST_TOKEN),
+    Endpoint('oauth_access_token', 'POST', OAUTH_ACCESS_TOKEN),
+)}
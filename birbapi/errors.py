@@ -0,0 +1,46 @@
+""" Exceptions raised by the birbapi clients """
+import json
+
+
+class TwitterError(Exception):
+    def __init__(self, response, decode=json.loads):
+        self.response_raw = response
+        try:
+            self.response = decode(response.content)
+        except ValueError:
+            # e.g. an HTML error page from a proxy or during an outage
+            self.response = {}
+        self.http_code   = response.status_code
+        self.error_msg   = self.get_msg()
+        self.error_code  = self.get_code()
+
+    def __str__(self):
+        return 'HTTP %s, error %s: %s' % (self.http_code, self.error_code, self.error_msg)
+
+    def get_msg(self):
+        error_msg = 'Unknown Twitter Error'
+        if 'errors' in self.response:
+            if len(self.response['errors']) > 0:
+                if 'message' in self.response['errors'][0]:
+                    error_msg = self.response['errors'][0]['message']
+        return error_msg
+
+    def get_code(self):
+        error_code = 0
+        if 'errors' in self.response:
+            if len(self.response['errors']) > 0:
+                if 'code' in self.response['errors'][0]:
+                    error_code = self.response['errors'][0]['code']
+        return error_code
+
+
+class RequestsError(Exception):
+    def __init__(self, msg=None, unsent=False):
+        self.error_msg  = 'Requests Unknown/Catchall Error'
+        if msg:
+            self.error_msg = msg
+        # true if the request never reached the server (safe to resend)
+        self.unsent     = unsent
+
+    def __str__(self):
+        return repr(self.error_msg)
@@ -0,0 +1,182 @@
+""" Streaming export of crawled pages to newline-delimited JSON, with
+    checkpoints so an interrupted export resumes where it stopped """
+import gzip
+import json
+import os
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+def project(record, fields):
+    """ Return { field : value } for dotted field paths, e.g. 'user.id';
+        missing fields are None """
+    projected = {}
+    for field in fields:
+        value = record
+        for key in field.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        projected[field] = value
+    return projected
+
+
+class NDJSONWriter():
+    """ Appends records to path as one JSON object per line.
+
+        fields: dotted field paths to keep (see project), or None for
+                whole records
+        compression: 'gzip', 'zstd' (needs the zstandard package), 'auto'
+                     for zstd when installed and gzip otherwise, or None
+                     to go by the file suffix (.gz, .zst)
+        buffer_size: bytes of encoded lines held before they are written
+
+        checkpoint(state) flushes everything written so far and records
+        state (e.g. the next cursor) with the file size next to the output,
+        in path + '.checkpoint'. Opening a writer on a path with a
+        checkpoint truncates anything written after it and exposes the
+        saved state as .state, so records are never duplicated on resume;
+        a path without a checkpoint is started afresh.
+        Compressed output is ended at each checkpoint and continued as a
+        new gzip member or zstd frame, which readers handle transparently.
+    """
+    def __init__(self, path, fields=None, compression=None, buffer_size=1 << 16):
+        self.path = path
+        self.fields = fields
+        self.buffer_size = buffer_size
+        self.compression = self.pick_compression(path, compression)
+        self.checkpoint_path = path + '.checkpoint'
+        self.state = None
+        self.records = 0
+        offset = 0
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+            self.state, self.records, offset = checkpoint['state'], checkpoint['records'], checkpoint['offset']
+        self.raw = open(path, 'ab')
+        self.raw.truncate(offset)
+        self.stream = None
+        self.buffer = []
+        self.buffered = 0
+
+
+    @staticmethod
+    def pick_compression(path, compression):
+        if compression is None:
+            compression = 'gzip' if path.endswith('.gz') else 'zstd' if path.endswith('.zst') else None
+        elif compression == 'auto':
+            compression = 'zstd' if zstandard is not None else 'gzip'
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError('zstd compression requires the zstandard package')
+        if compression not in (None, 'gzip', 'zstd'):
+            raise ValueError('Unknown compression: %r' % compression)
+        return compression
+
+
+    def open_stream(self):
+        if self.compression == 'gzip':
+            return gzip.GzipFile(fileobj=self.raw, mode='wb')
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor().stream_writer(self.raw, closefd=False)
+        return self.raw
+
+
+    def write(self, record):
+        if self.fields is not None:
+            record = project(record, self.fields)
+        line = json.dumps(record, separators=(',', ':'), ensure_ascii=False).encode() + b'\n'
+        self.buffer.append(line)
+        self.buffered += len(line)
+        self.records += 1
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.stream is None:
+            self.stream = self.open_stream()
+        self.stream.write(b''.join(self.buffer))
+        self.buffer = []
+        self.buffered = 0
+
+
+    def checkpoint(self, state):
+        """ Make everything written so far durable and remember state """
+        self.flush()
+        if self.stream is not None and self.stream is not self.raw:
+            self.stream.close()
+            self.stream = None
+        self.raw.flush()
+        os.fsync(self.raw.fileno())
+        self.state = state
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({ 'state' : state, 'records' : self.records,
+                        'offset' : os.fstat(self.raw.fileno()).st_size }, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+
+    def close(self):
+        """ Flush and close, without checkpointing; unflushed state is
+            lost unless checkpoint() was called """
+        self.flush()
+        if self.stream is not None and self.stream is not self.raw:
+            self.stream.close()
+        self.raw.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_search(twitter, q, writer, since_id=None, **kwargs):
+    """ Write every status matching q to writer, newest first, with a
+        checkpoint after each page. Returns the number of records in the
+        file. Run again with the same writer path to resume.
+
+        kwargs: passed to Twitter.iter_search, e.g. count=100
+    """
+    state = writer.state or { 'since_id' : since_id, 'max_id' : None }
+    if state.get('done'):
+        return writer.records
+    if state['max_id'] is not None:
+        kwargs['max_id'] = state['max_id']
+    for statuses in twitter.iter_search(q, since_id=state['since_id'], **kwargs):
+        writer.write_all(statuses)
+        state = dict(state, max_id=min(status['id'] for status in statuses) - 1)
+        writer.checkpoint(state)
+    writer.checkpoint(dict(state, done=True))
+    return writer.records
+
+
+def export_followers(twitter, user_id, writer, friends=False, hydrate=True, **kwargs):
+    """ Write the followers (or with friends, the friends) of user_id to
+        writer, one page of IDs at a time, checkpointing the cursor after
+        each. Returns the number of records in the file.
+
+        hydrate: write full user objects through Twitter.hydrate_users;
+                 otherwise records are just { 'id' : id }
+        kwargs: passed to Twitter.hydrate_users
+    """
+    cursor = writer.state['cursor'] if writer.state else -1
+    pages = twitter.iter_friend_ids(user_id, cursor) if friends else \
+            twitter.iter_follower_ids(user_id, cursor)
+    for page in pages:
+        if hydrate:
+            writer.write_all(twitter.hydrate_users(page.ids, **kwargs))
+        else:
+            writer.write_all({ 'id' : id } for id in page.ids)
+        writer.checkpoint({ 'cursor' : page.next_cursor })
+    return writer.records
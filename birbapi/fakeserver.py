@@ -0,0 +1,303 @@
+""" A local stand-in for api.twitter.com, for offline tests and benchmarks
+
+    Serves the endpoints in resource_urls from generated data:
+
+        server = FakeTwitterServer(followers=100000, latency=0.005)
+        with server:
+            twitter = Twitter('key', 'secret', 'token', 'secret', api_root=server.root)
+
+    Every user is followed by IDs 1..followers and follows every other one
+    of those counting down from followers (see is_friend),
+    search results are tweet IDs 1..tweets, and any user ID below
+    missing_after resolves to a user. Rate-limit headers are sent for every
+    resource and exhausted windows answer 429, as Twitter does.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from birbapi.resource_urls import resource_name
+
+
+# Requests per 15-minute window, per resource
+DEFAULT_LIMITS = {
+    '/search/tweets' : 180,
+    '/friends/ids' : 15,
+    '/followers/ids' : 15,
+    '/users/lookup' : 900,
+    '/users/show' : 900,
+    '/friendships/show' : 180,
+    '/friendships/lookup' : 15,
+    '/application/rate_limit_status' : 180,
+}
+
+IDS_PAGE_SIZE = 5000
+CREATED_AT = 'Wed Aug 27 13:08:45 +0000 2008'
+
+
+class FakeTwitterServer():
+    """ Threaded HTTP server imitating the Twitter API.
+
+        followers: follower count of every user
+        tweets: number of tweets matching any search
+        missing_after: user IDs at or above this don't exist
+        latency: seconds to sleep before each reply
+        error_rate: fraction of requests answered with a 503
+        limits: requests per window per resource, defaulting to
+                DEFAULT_LIMITS; False to send no rate-limit headers at all
+        window: rate-limit window length in seconds
+    """
+    def __init__(self, followers=20000, tweets=1000, missing_after=10 ** 12, latency=0, error_rate=0,
+            limits=None, window=15 * 60, seed=0, host='127.0.0.1', port=0):
+        self.followers = followers
+        self.tweets = tweets
+        self.missing_after = missing_after
+        self.latency = latency
+        self.error_rate = error_rate
+        if limits is False:
+            self.limits = None
+        else:
+            self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.window = window
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.windows = {}
+        self.requests = 0
+        self.httpd = ThreadingHTTPServer((host, port), FakeTwitterHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self.thread = None
+
+
+    @property
+    def root(self):
+        return 'http://%s:%d' % self.httpd.server_address
+
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.root
+
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+    def spend(self, resource):
+        """ Take one request from resource's window; return its headers
+            and whether the request is allowed """
+        with self.lock:
+            self.requests += 1
+            if self.limits is None or resource not in self.limits:
+                return {}, True
+            now = time.time()
+            reset, remaining = self.windows.get(resource, (0, 0))
+            if now >= reset:
+                reset, remaining = int(now) + self.window, self.limits[resource]
+            allowed = remaining > 0
+            remaining = max(remaining - 1, 0)
+            self.windows[resource] = (reset, remaining)
+        return { 'x-rate-limit-limit' : str(self.limits[resource]),
+                 'x-rate-limit-remaining' : str(remaining),
+                 'x-rate-limit-reset' : str(reset) }, allowed
+
+
+    def is_friend(self, user_id):
+        return 0 < user_id <= self.followers and (self.followers - user_id) % 2 == 0
+
+
+    def is_follower(self, user_id):
+        return 0 < user_id <= self.followers
+
+
+    def fail(self):
+        with self.lock:
+            return self.error_rate and self.random.random() < self.error_rate
+
+
+def make_user(user_id):
+    return { 'id' : user_id, 'id_str' : str(user_id), 'name' : 'Birb %d' % user_id,
+             'screen_name' : 'birb%d' % user_id, 'location' : 'Nest',
+             'description' : 'Sings at dawn. ' * 6, 'protected' : False, 'verified' : False,
+             'followers_count' : user_id % 1000, 'friends_count' : user_id % 500,
+             'statuses_count' : user_id % 5000, 'created_at' : CREATED_AT,
+             'profile_image_url_https' : 'https://pbs.twimg.com/profile_images/%d/a.jpg' % user_id }
+
+
+def make_tweet(tweet_id, q):
+    return { 'id' : tweet_id, 'id_str' : str(tweet_id), 'created_at' : CREATED_AT,
+             'text' : 'tweet %d about %s' % (tweet_id, q), 'lang' : 'en', 'retweet_count' : tweet_id % 7,
+             'favorite_count' : tweet_id % 11, 'in_reply_to_status_id' : None,
+             'user' : make_user(tweet_id % 5000 + 1), 'entities' : { 'hashtags' : [], 'urls' : [] } }
+
+
+def error_body(code, message):
+    return { 'errors' : [{ 'code' : code, 'message' : message }] }
+
+
+class FakeTwitterHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes; don't let Nagle stall them
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.handle_api(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        params = parse_qs(urlparse(self.path).query)
+        params.update(parse_qs(self.rfile.read(length).decode()))
+        self.handle_api(params)
+
+    def handle_api(self, params):
+        fake = self.server.fake
+        params = { key : values[0] for key, values in params.items() }
+        path = urlparse(self.path).path
+        resource = resource_name(path)
+        if fake.latency:
+            time.sleep(fake.latency)
+        headers, allowed = fake.spend(resource)
+        if not allowed:
+            return self.reply(429, error_body(88, 'Rate limit exceeded'), headers)
+        if fake.fail():
+            return self.reply(503, error_body(130, 'Over capacity'), headers)
+
+        route = ROUTES.get(resource)
+        if route is None:
+            return self.reply(404, error_body(34, 'Sorry, that page does not exist'), headers)
+        status, body = route(fake, params)
+        self.reply(status, body, headers)
+
+    def reply(self, status, body, headers):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def ids_page(fake, params, step):
+    """ Cursor N (N >= 1) starts at page N; -1 is the first page """
+    page = max(int(params.get('cursor', -1)), 1) - 1
+    count = min(int(params.get('count', IDS_PAGE_SIZE)), IDS_PAGE_SIZE)
+    start = page * count
+    ids = list(range(fake.followers - start * step, max(fake.followers - (start + count) * step, 0), -step))
+    next_cursor = page + 2 if fake.followers - (start + count) * step > 0 else 0
+    previous_cursor = -page if page else 0
+    return 200, { 'ids' : ids, 'next_cursor' : next_cursor, 'next_cursor_str' : str(next_cursor),
+                  'previous_cursor' : previous_cursor, 'previous_cursor_str' : str(previous_cursor) }
+
+
+def followers_ids(fake, params):
+    return ids_page(fake, params, 1)
+
+
+def friends_ids(fake, params):
+    return ids_page(fake, params, 2)
+
+
+def search_tweets(fake, params):
+    count = min(int(params.get('count', 15)), 100)
+    newest = min(int(params.get('max_id', fake.tweets)), fake.tweets)
+    oldest = int(params.get('since_id', 0))
+    ids = range(newest, max(newest - count, oldest), -1)
+    return 200, { 'statuses' : [make_tweet(i, params.get('q', '')) for i in ids],
+                  'search_metadata' : { 'count' : count, 'max_id' : newest } }
+
+
+def users_lookup(fake, params):
+    users = [make_user(int(i)) for i in params.get('user_id', '').split(',')
+            if i and int(i) < fake.missing_after]
+    if not users:
+        return 404, error_body(17, 'No user matches for specified terms.')
+    return 200, users
+
+
+def users_show(fake, params):
+    user_id = int(params.get('user_id', 0))
+    if not 0 < user_id < fake.missing_after:
+        return 404, error_body(50, 'User not found.')
+    return 200, make_user(user_id)
+
+
+def friendships_show(fake, params):
+    source, target = int(params['source_id']), int(params['target_id'])
+    following, followed_by = fake.is_friend(target), fake.is_follower(target)
+    return 200, { 'relationship' : {
+        'source' : { 'id' : source, 'following' : following, 'followed_by' : followed_by },
+        'target' : { 'id' : target, 'following' : followed_by, 'followed_by' : following } } }
+
+
+def friendships_lookup(fake, params):
+    users = []
+    for i in params.get('user_id', '').split(','):
+        if not i or int(i) >= fake.missing_after:
+            continue
+        connections = [name for name, connected in
+                (('following', fake.is_friend(int(i))), ('followed_by', fake.is_follower(int(i))))
+                if connected]
+        users.append({ 'id' : int(i), 'id_str' : i, 'screen_name' : 'birb%s' % i,
+                       'name' : 'Birb %s' % i, 'connections' : connections or ['none'] })
+    if not users:
+        return 404, error_body(17, 'No user matches for specified terms.')
+    return 200, users
+
+
+def rate_limit_status(fake, params):
+    resources = {}
+    now = time.time()
+    with fake.lock:
+        for resource, limit in (fake.limits or {}).items():
+            reset, remaining = fake.windows.get(resource, (int(now) + fake.window, limit))
+            resources.setdefault(resource.split('/')[1], {})[resource] = {
+                'limit' : limit, 'remaining' : remaining if now < reset else limit, 'reset' : reset }
+    return 200, { 'resources' : resources }
+
+
+def write_action(fake, params):
+    return 200, { 'id' : int(params.get('id') or params.get('user_id') or 1), 'created_at' : CREATED_AT }
+
+
+def status_update(fake, params):
+    with fake.lock:
+        tweet_id = fake.tweets + fake.requests
+    return 200, { 'id' : tweet_id, 'text' : params.get('status', ''), 'created_at' : CREATED_AT }
+
+
+ROUTES = {
+    '/search/tweets' : search_tweets,
+    '/friends/ids' : friends_ids,
+    '/followers/ids' : followers_ids,
+    '/users/lookup' : users_lookup,
+    '/users/show' : users_show,
+    '/friendships/show' : friendships_show,
+    '/friendships/lookup' : friendships_lookup,
+    '/application/rate_limit_status' : rate_limit_status,
+    '/favorites/create' : write_action,
+    '/favorites/destroy' : write_action,
+    '/friendships/create' : write_action,
+    '/friendships/destroy' : write_action,
+    '/statuses/retweet/:id' : write_action,
+    '/statuses/destroy/:id' : write_action,
+    '/statuses/update' : status_update,
+}
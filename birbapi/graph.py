@@ -0,0 +1,271 @@
+""" Follower/friend snapshots stored as sorted ID arrays, and diffs between them """
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from heapq import merge as heap_merge
+
+
+# IDs kept in API (newest first) order for incremental refreshes: one page
+HEAD_SIZE = 5000
+
+GraphDiff = namedtuple('GraphDiff', ['added', 'removed', 'complete'])
+
+
+class Snapshot():
+    """ A sorted, deduplicated set of user IDs.
+
+        ids: sorted sequence of ints; array('q') or a memory-mapped view
+        head: the newest IDs in the order Twitter returned them
+    """
+    def __init__(self, ids, head=None, mapping=None):
+        self.ids = ids
+        self.head = head if head is not None else array('q')
+        self.mapping = mapping
+
+    @classmethod
+    def from_ids(cls, ids):
+        """ Build from IDs in API order, e.g. chained IDPage.ids. Each
+            page's worth is sorted on its own and the runs are merged, so
+            memory stays in arrays rather than one Python int per ID. """
+        if not isinstance(ids, array):
+            ids = array('q', ids)
+        runs = [array('q', sorted(set(ids[start:start + HEAD_SIZE])))
+                for start in range(0, len(ids), HEAD_SIZE)]
+        return cls(merge(runs), ids[:HEAD_SIZE])
+
+    @classmethod
+    def load(cls, path):
+        """ Map path.ids into memory rather than reading it; the head is
+            small and read outright. Returns None if there is no snapshot. """
+        if not os.path.exists(path + '.ids'):
+            return None
+        head = array('q')
+        with open(path + '.head', 'rb') as f:
+            head.frombytes(f.read())
+        with open(path + '.ids', 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return cls(array('q'), head)
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(memoryview(mapping).cast('q'), head, mapping)
+
+    def save(self, path):
+        """ Write path.ids and path.head, each replaced atomically """
+        for suffix, ids in (('.ids', self.ids), ('.head', self.head)):
+            tmp_path = path + suffix + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(ids if isinstance(ids, array) else ids.tobytes())
+            os.replace(tmp_path, path + suffix)
+
+    def close(self):
+        if self.mapping is not None:
+            self.ids.release()
+            self.mapping.close()
+            self.mapping = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __contains__(self, user_id):
+        i = bisect_left(self.ids, user_id)
+        return i < len(self.ids) and self.ids[i] == user_id
+
+
+def difference(a, b):
+    """ Return array('q') of IDs in sorted a but not in sorted b """
+    result = array('q')
+    j, m = 0, len(b)
+    for x in a:
+        while j < m and b[j] < x:
+            j += 1
+        if j == m or b[j] != x:
+            result.append(x)
+    return result
+
+
+def intersection(a, b):
+    """ Return array('q') of IDs in both sorted a and sorted b """
+    result = array('q')
+    j, m = 0, len(b)
+    for x in a:
+        while j < m and b[j] < x:
+            j += 1
+        if j == m:
+            break
+        if b[j] == x:
+            result.append(x)
+    return result
+
+
+def union(a, b):
+    """ Return array('q') of sorted a merged with sorted b, without repeats """
+    result = array('q')
+    i, j, n, m = 0, 0, len(a), len(b)
+    while i < n and j < m:
+        if a[i] < b[j]:
+            result.append(a[i])
+            i += 1
+        elif b[j] < a[i]:
+            result.append(b[j])
+            j += 1
+        else:
+            result.append(a[i])
+            i += 1
+            j += 1
+    result.extend(a[i:])
+    result.extend(b[j:])
+    return result
+
+
+def merge(runs):
+    """ Return array('q') of any number of sorted runs merged, without repeats """
+    result = array('q')
+    result.extend(unique(heap_merge(*runs)))
+    return result
+
+
+def unique(ids):
+    """ Generate sorted ids with repeats dropped """
+    last = None
+    for id in ids:
+        if id != last:
+            yield id
+            last = id
+
+
+class SocialGraph():
+    """ Keeps one follower and one friend snapshot per user on disk and
+        reports what changed between refreshes.
+
+        twitter: the Twitter client to page IDs through
+        directory: where snapshots are kept, as <kind>-<user_id>.ids and
+                   .head files of native int64s
+
+            graph = SocialGraph(twitter, 'snapshots')
+            diff = graph.refresh('followers', 12)
+            for user in graph.hydrate(diff):
+                ...
+    """
+    def __init__(self, twitter, directory):
+        self.twitter = twitter
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+
+    def path(self, kind, user_id):
+        if kind not in ('followers', 'friends'):
+            raise ValueError('kind must be followers or friends, not %r' % kind)
+        return os.path.join(self.directory, '%s-%s' % (kind, user_id))
+
+
+    def load(self, kind, user_id):
+        """ Return the stored Snapshot for kind ('followers' or 'friends')
+            of user_id, or None. Close it when done. """
+        return Snapshot.load(self.path(kind, user_id))
+
+
+    def pages(self, kind, user_id):
+        if kind == 'followers':
+            return self.twitter.iter_follower_ids(user_id)
+        return self.twitter.iter_friend_ids(user_id)
+
+
+    def refresh(self, kind, user_id, full=False, overlap=100):
+        """ Fetch kind IDs of user_id, store them, and return a GraphDiff
+            against the previous snapshot.
+
+            full: page through every ID. Otherwise paging stops once
+                  overlap consecutive IDs are found in the stored head,
+                  i.e. the newest IDs known from last time. That finds
+                  every new ID for a fraction of the requests, but not the
+                  lost ones, so removed is empty and complete is False
+                  unless paging happened to reach the end anyway.
+        """
+        path = self.path(kind, user_id)
+        old = Snapshot.load(path)
+        try:
+            if old is None:
+                new = Snapshot.from_ids(self.fetch(kind, user_id))
+                diff = GraphDiff(new.ids, array('q'), True)
+            elif full:
+                new = Snapshot.from_ids(self.fetch(kind, user_id))
+                diff = GraphDiff(difference(new.ids, old.ids), difference(old.ids, new.ids), True)
+            else:
+                fetched, complete = self.fetch_new(kind, user_id, old.head, overlap)
+                if complete:
+                    new = Snapshot.from_ids(fetched)
+                    diff = GraphDiff(difference(new.ids, old.ids), difference(old.ids, new.ids), True)
+                else:
+                    seen = set(fetched)
+                    added = difference(array('q', sorted(seen)), old.ids)
+                    head = array('q', fetched)
+                    head.extend(id for id in old.head if id not in seen)
+                    new = Snapshot(union(old.ids, added), head[:HEAD_SIZE])
+                    diff = GraphDiff(added, array('q'), False)
+            new.save(path)
+        finally:
+            if old is not None:
+                old.close()
+        return diff
+
+
+    def fetch(self, kind, user_id):
+        ids = array('q')
+        for page in self.pages(kind, user_id):
+            ids.extend(page.ids)
+        return ids
+
+
+    def fetch_new(self, kind, user_id, head, overlap):
+        """ Return (IDs up to and including the known run, whether paging
+            reached the end) """
+        known = set(head)
+        needed = min(overlap, len(known))
+        ids = array('q')
+        run = 0
+        for page in self.pages(kind, user_id):
+            for id in page.ids:
+                ids.append(id)
+                run = run + 1 if id in known else 0
+                if needed and run >= needed:
+                    return ids, False
+        return ids, True
+
+
+    def mutuals(self, user_id):
+        """ Return array('q') of stored IDs that both follow and are
+            followed by user_id """
+        followers, friends = self.load('followers', user_id), self.load('friends', user_id)
+        try:
+            if followers is None or friends is None:
+                return array('q')
+            return intersection(followers.ids, friends.ids)
+        finally:
+            for snapshot in (followers, friends):
+                if snapshot is not None:
+                    snapshot.close()
+
+
+    def relationships(self, user_id, target_ids, **kwargs):
+        """ Twitter.relationships for user_id, which must be the
+            authenticated user, answered from the stored snapshots when
+            both exist """
+        followers, friends = self.load('followers', user_id), self.load('friends', user_id)
+        try:
+            if followers is None or friends is None:
+                return self.twitter.relationships(target_ids, **kwargs)
+            return self.twitter.relationships(target_ids, followers, friends, **kwargs)
+        finally:
+            for snapshot in (followers, friends):
+                if snapshot is not None:
+                    snapshot.close()
+
+
+    def hydrate(self, diff, removed=False, **kwargs):
+        """ Generate user objects for the IDs a GraphDiff added, or with
+            removed those it lost. kwargs go to Twitter.hydrate_users. """
+        return self.twitter.hydrate_users(diff.removed if removed else diff.added, **kwargs)
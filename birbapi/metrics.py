@@ -0,0 +1,135 @@
+""" Per-request instrumentation: events, an in-process aggregator and a
+    Prometheus adapter """
+import logging
+import threading
+from collections import deque
+
+
+class RequestEvent():
+    """ What happened to one client call, passed to every hook.
+
+        resource: rate-limit resource name, e.g. '/friends/ids'
+        method: 'GET' or 'POST'
+        status: HTTP status of the final attempt, None if it raised
+        bytes: size of the response body
+        elapsed: seconds from sending the final attempt to its headers
+        total: seconds for the whole call, including retries and waits
+        retries: attempts made beyond the first
+        rate_limit: (limit, remaining, reset) from the response headers,
+                    or None if absent
+        cached: true if answered from the response cache
+        error: the exception raised, if any
+    """
+    __slots__ = ('resource', 'method', 'status', 'bytes', 'elapsed', 'total', 'retries',
+            'rate_limit', 'cached', 'error')
+
+    def __init__(self, resource, method, status=None, bytes=0, elapsed=0.0, total=0.0, retries=0,
+            rate_limit=None, cached=False, error=None):
+        self.resource = resource
+        self.method = method
+        self.status = status
+        self.bytes = bytes
+        self.elapsed = elapsed
+        self.total = total
+        self.retries = retries
+        self.rate_limit = rate_limit
+        self.cached = cached
+        self.error = error
+
+    @property
+    def failed(self):
+        return self.error is not None or self.status is None or self.status >= 400
+
+
+def rate_limit_headers(headers):
+    """ Return (limit, remaining, reset) from x-rate-limit-* headers, or None """
+    try:
+        return (int(headers['x-rate-limit-limit']), int(headers['x-rate-limit-remaining']),
+                int(headers['x-rate-limit-reset']))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def fire(hooks, event):
+    """ Pass event to each hook; a failing hook is logged, never raised """
+    for hook in hooks:
+        try:
+            hook(event)
+        except Exception:
+            logging.exception('Request hook %r failed', hook)
+
+
+class StatsAggregator():
+    """ Hook keeping per-resource counts, error rates and latency
+        percentiles over the most recent samples (window per resource) """
+    def __init__(self, window=1024):
+        self.window = window
+        self.resources = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, event):
+        with self.lock:
+            stats = self.resources.get(event.resource)
+            if stats is None:
+                stats = self.resources[event.resource] = { 'requests' : 0, 'errors' : 0,
+                        'cached' : 0, 'retries' : 0, 'bytes' : 0,
+                        'latencies' : deque(maxlen=self.window) }
+            stats['requests'] += 1
+            stats['errors'] += event.failed
+            stats['cached'] += event.cached
+            stats['retries'] += event.retries
+            stats['bytes'] += event.bytes
+            if not event.cached:
+                stats['latencies'].append(event.total)
+
+    def summary(self):
+        """ Return { resource : counts plus error_rate, p50 and p99 seconds } """
+        with self.lock:
+            summary = {}
+            for resource, stats in self.resources.items():
+                latencies = sorted(stats['latencies'])
+                summary[resource] = { key : value for key, value in stats.items() if key != 'latencies' }
+                summary[resource]['error_rate'] = stats['errors'] / stats['requests']
+                summary[resource]['p50'] = percentile(latencies, 0.50)
+                summary[resource]['p99'] = percentile(latencies, 0.99)
+        return summary
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class PrometheusHook():
+    """ Hook exporting request counters, latency histograms and rate-limit
+        gauges through prometheus_client """
+    def __init__(self, namespace='birbapi', registry=None):
+        # imported here so clients without this hook never load it
+        try:
+            import prometheus_client
+        except ImportError:
+            raise ImportError('PrometheusHook requires the prometheus_client package')
+        registry = registry if registry is not None else prometheus_client.REGISTRY
+        self.requests = prometheus_client.Counter('requests', 'Twitter API calls',
+                ['resource', 'method', 'status'], namespace=namespace, registry=registry)
+        self.retries = prometheus_client.Counter('retries', 'Twitter API call retries',
+                ['resource'], namespace=namespace, registry=registry)
+        self.bytes = prometheus_client.Counter('response_bytes', 'Twitter API response bytes',
+                ['resource'], namespace=namespace, registry=registry)
+        self.latency = prometheus_client.Histogram('request_seconds', 'Twitter API call latency',
+                ['resource'], namespace=namespace, registry=registry)
+        self.remaining = prometheus_client.Gauge('rate_limit_remaining', 'Requests left in window',
+                ['resource'], namespace=namespace, registry=registry)
+
+    def __call__(self, event):
+        resource = event.resource or 'oauth'
+        status = 'error' if event.status is None else str(event.status)
+        self.requests.labels(resource, event.method, status).inc()
+        if event.retries:
+            self.retries.labels(resource).inc(event.retries)
+        self.bytes.labels(resource).inc(event.bytes)
+        if not event.cached:
+            self.latency.labels(resource).observe(event.total)
+        if event.rate_limit is not None:
+            self.remaining.labels(resource).set(event.rate_limit[1])
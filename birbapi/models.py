@@ -0,0 +1,146 @@
+""" Compact, lazily-decoded result objects for tweets, users and relationships """
+import json
+
+from birbapi.timestamps import timestr_to_timestamp
+
+
+class Model():
+    """ Base for the result objects below.
+
+        Each keeps only a few fields, in __slots__, instead of the full
+        nested dict. A model built from raw JSON bytes decodes them on
+        first field access, and .data decodes the full object on demand.
+        Subclasses list their field names in FIELDS and fill them in fill().
+    """
+    __slots__ = ('raw', 'decoded')
+    FIELDS = ()
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.decoded = False
+
+    @classmethod
+    def from_dict(cls, data, keep_raw=False):
+        """ Build from an already-decoded dict. The dict isn't kept; with
+            keep_raw a compact JSON copy is, so .data still works. """
+        model = cls.__new__(cls)
+        model.raw = json.dumps(data, separators=(',', ':')).encode() if keep_raw else None
+        model.fill(data)
+        return model
+
+    def fill(self, data):
+        raise NotImplementedError
+
+    def __getattr__(self, name):
+        # only reached for unset slots, i.e. before the first decode
+        if name in self.FIELDS and not self.decoded and self.raw is not None:
+            self.fill(json.loads(self.raw))
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    @property
+    def data(self):
+        """ The full decoded object, or None if the raw JSON wasn't kept """
+        if self.raw is None:
+            return None
+        return json.loads(self.raw)
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.id)
+
+
+class Tweet(Model):
+    """ A status, slimmed as if requested with trim_user: the author is
+        kept as user_id only. """
+    __slots__ = ('id', 'created_at', 'text', 'user_id', 'in_reply_to_status_id',
+            'retweet_count', 'favorite_count', 'lang')
+    FIELDS = frozenset(__slots__)
+
+    def fill(self, data):
+        self.id = data['id']
+        self.created_at = data.get('created_at')
+        self.text = data.get('full_text') or data.get('text')
+        self.user_id = data['user']['id'] if 'user' in data else None
+        self.in_reply_to_status_id = data.get('in_reply_to_status_id')
+        self.retweet_count = data.get('retweet_count', 0)
+        self.favorite_count = data.get('favorite_count', 0)
+        self.lang = data.get('lang')
+        self.decoded = True
+
+    @property
+    def timestamp(self):
+        return timestr_to_timestamp(self.created_at)
+
+
+class User(Model):
+    __slots__ = ('id', 'screen_name', 'name', 'created_at', 'followers_count',
+            'friends_count', 'statuses_count', 'protected', 'verified')
+    FIELDS = frozenset(__slots__)
+
+    def fill(self, data):
+        self.id = data['id']
+        self.screen_name = data.get('screen_name')
+        self.name = data.get('name')
+        self.created_at = data.get('created_at')
+        self.followers_count = data.get('followers_count', 0)
+        self.friends_count = data.get('friends_count', 0)
+        self.statuses_count = data.get('statuses_count', 0)
+        self.protected = data.get('protected', False)
+        self.verified = data.get('verified', False)
+        self.decoded = True
+
+
+class Relationship(Model):
+    """ The friendships/show relationship between a source and target user """
+    __slots__ = ('source_id', 'target_id', 'following', 'followed_by')
+    FIELDS = frozenset(__slots__)
+
+    def fill(self, data):
+        relationship = data['relationship'] if 'relationship' in data else data
+        self.source_id = relationship['source']['id']
+        self.target_id = relationship['target']['id']
+        self.following = relationship['source']['following']
+        self.followed_by = relationship['source']['followed_by']
+        self.decoded = True
+
+    def __repr__(self):
+        return '<Relationship %s -> %s>' % (self.source_id, self.target_id)
+
+
+# Bits of the compact relationship flags returned by Twitter.relationships
+FOLLOWING = 1
+FOLLOWED_BY = 2
+
+
+def connection_flags(connections):
+    """ Return the flags for a friendships/lookup connections list """
+    return ((FOLLOWING if 'following' in connections else 0) |
+            (FOLLOWED_BY if 'followed_by' in connections else 0))
+
+
+def tweets_from_response(response, keep_raw=False):
+    """ Return Tweets from a search/tweets or status list response """
+    statuses = response.json()
+    if isinstance(statuses, dict):
+        statuses = statuses['statuses']
+    return [Tweet.from_dict(status, keep_raw) for status in statuses]
+
+
+def users_from_response(response, keep_raw=False):
+    """ Return Users from a users/lookup response """
+    return [User.from_dict(user, keep_raw) for user in response.json()]
+
+
+def user_from_response(response):
+    """ Return a lazily-decoded User from a users/show response """
+    return User(response.content)
+
+
+def tweet_from_response(response):
+    """ Return a lazily-decoded Tweet from a single-status response """
+    return Tweet(response.content)
+
+
+def relationship_from_response(response):
+    """ Return a lazily-decoded Relationship from a friendships/show response """
+    return Relationship(response.content)
@@ -0,0 +1,140 @@
+""" Load-balanced dispatch of read calls across many accounts """
+import logging
+import threading
+import time
+from functools import partial
+
+from birbapi.birbapi import Twitter
+from birbapi.endpoints import ENDPOINTS
+from birbapi.errors import TwitterError
+from birbapi.ratelimit import RateLimitExceeded
+
+
+# Read methods the pool routes, and the resource each one spends
+READ_METHODS = { name : endpoint.resource for name, endpoint in ENDPOINTS.items()
+        if not endpoint.write and endpoint.resource is not None }
+
+# Error codes meaning the account itself can't be used: bad or expired
+# credentials, suspended, or locked
+ACCOUNT_ERROR_CODES = frozenset([32, 64, 89, 326])
+
+
+class TwitterPool():
+    """ Spreads read calls over many accounts to multiply throughput.
+
+        credentials: Twitter instances, or (conkey, consec, otoken, osecret)
+                     tuples to build them from
+        wait: when every account is exhausted, sleep until the first
+              window resets instead of raising RateLimitExceeded
+        **kwargs: passed to Twitter() for clients built from tuples; not
+                  rate_limiter, as each account needs its own (pass
+                  Twitter instances to choose their limiters)
+
+        Each read call (see READ_METHODS), e.g. pool.users_lookup(ids), goes
+        to the account with the most remaining budget for that resource,
+        as tracked by each client's own RateLimiter. An account that is
+        rate limited is skipped for that call; one that fails to
+        authenticate or is suspended is dropped from the pool. Clients
+        should use the 'raise' rate limit policy (the default) so the pool
+        can fail over rather than the client sleeping.
+    """
+    def __init__(self, credentials, wait=True, **kwargs):
+        if 'rate_limiter' in kwargs:
+            raise ValueError('A shared rate_limiter would pool every account\'s budget; '
+                    'pass Twitter instances with their own limiters instead')
+        self.clients = []
+        for credential in credentials:
+            if not isinstance(credential, Twitter):
+                credential = Twitter(*credential, **kwargs)
+            self.clients.append(credential)
+        if not self.clients:
+            raise ValueError('TwitterPool needs at least one set of credentials')
+        self.wait = wait
+        self.disabled = set()
+        self.next_client = 0
+        self.lock = threading.Lock()
+
+
+    def __getattr__(self, name):
+        if name in READ_METHODS:
+            return partial(self.call, name)
+        raise AttributeError(name)
+
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def call(self, method, *args, **kwargs):
+        """ Run a read method on the best available account, failing over
+            to the others when one is rate limited or unusable """
+        resource = READ_METHODS[method]
+        last_error = None
+        while True:
+            skipped = set()
+            while True:
+                client = self.pick(resource, skipped)
+                if client is None:
+                    break
+                try:
+                    return getattr(client, method)(*args, **kwargs)
+                except TwitterError as e:
+                    last_error = e
+                    if e.error_code in ACCOUNT_ERROR_CODES:
+                        logging.warning('Dropping account %s from pool: %s', client.oauth_token, e.error_msg)
+                        with self.lock:
+                            self.disabled.add(id(client))
+                    elif e.http_code != 429:
+                        raise
+                    skipped.add(id(client))
+
+            delay = self.soonest_reset(resource)
+            if delay is None:
+                # every account has been dropped
+                raise last_error or RuntimeError('No usable accounts left in pool')
+            if not self.wait:
+                raise RateLimitExceeded(resource, time.time() + delay)
+            logging.info('All accounts limited for %s, sleeping %.0fs', resource, delay)
+            time.sleep(delay)
+
+
+    def pick(self, resource, skipped=()):
+        """ Return the usable client with the most budget left for resource.
+            Unknown budgets count as full; ties go round-robin. """
+        with self.lock:
+            best = None
+            best_remaining = 0
+            count = len(self.clients)
+            for offset in range(count):
+                client = self.clients[(self.next_client + offset) % count]
+                if id(client) in self.disabled or id(client) in skipped:
+                    continue
+                remaining = client.rate_limiter.remaining(resource)
+                if remaining is None:
+                    remaining = float('inf')
+                if remaining > best_remaining:
+                    best, best_remaining = client, remaining
+            self.next_client = (self.next_client + 1) % count
+            return best
+
+
+    def soonest_reset(self, resource):
+        """ Seconds until the first usable account's window resets, or None
+            if no usable accounts remain """
+        delays = [client.rate_limiter.delay(resource) for client in self.clients
+                if id(client) not in self.disabled]
+        return min(delays) if delays else None
+
+
+    def status(self):
+        """ Return each account's rate-limit state, keyed by oauth token """
+        return { client.oauth_token : client.rate_limiter.status() for client in self.clients }
@@ -0,0 +1,164 @@
+""" Client-side rate-limit tracking driven by x-rate-limit-* headers """
+import threading
+import time
+
+from birbapi.errors import TwitterError
+from birbapi.resource_urls import resource_family
+
+
+# Twitter's "Rate limit exceeded" error code
+RATE_LIMIT_ERROR_CODE = 88
+
+WAIT = 'wait'
+RAISE = 'raise'
+TRACK = 'track'
+
+
+class RateLimitExceeded(TwitterError):
+    """ Raised before sending a request that the tracked limits say would
+        be rejected. A TwitterError subclass, so code that already handles
+        Twitter's own 429 responses keeps working. """
+    def __init__(self, resource, reset):
+        self.response_raw = None
+        self.response    = {}
+        self.http_code   = 429
+        self.error_code  = RATE_LIMIT_ERROR_CODE
+        self.error_msg   = 'Rate limit exceeded for %s until %d' % (resource, reset)
+        self.resource    = resource
+        self.reset       = reset
+
+    def __str__(self):
+        return self.error_msg
+
+
+class RateLimitBucket():
+    """ Request budget for one resource during the current window """
+    __slots__ = ('limit', 'remaining', 'reset')
+
+    def __init__(self, limit, remaining, reset):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+
+    def as_dict(self):
+        return { 'limit' : self.limit, 'remaining' : self.remaining, 'reset' : self.reset }
+
+
+class RateLimiter():
+    """ Per-resource token buckets fed from every response's headers.
+
+        policy: what to do when a bucket is empty before sending
+            'wait'  - sleep until the window resets, then send
+            'raise' - raise RateLimitExceeded without sending
+            'track' - record state only, always send
+        margin: extra seconds to wait past the advertised reset time
+
+        Buckets are keyed by resource name (see resource_urls.resource_name)
+        and start unknown; the first response for a resource fills it in.
+        One limiter may be shared by several clients using the same
+        credentials, from any number of threads.
+    """
+    def __init__(self, policy=RAISE, margin=1, clock=time.time):
+        if policy not in (WAIT, RAISE, TRACK):
+            raise ValueError('Unknown rate limit policy: %r' % policy)
+        self.policy = policy
+        self.margin = margin
+        self.clock = clock
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+
+    def reserve(self, resource):
+        """ Take one request from resource's bucket.
+
+            Returns 0 if the request may be sent now, or the number of
+            seconds to sleep before calling reserve() again. Raises
+            RateLimitExceeded under the 'raise' policy.
+        """
+        if resource is None:
+            return 0
+        with self.lock:
+            bucket = self.buckets.get(resource)
+            if bucket is None:
+                return 0
+            now = self.clock()
+            if now >= bucket.reset:
+                if not bucket.limit:
+                    # limit never advertised; forget the bucket until it is
+                    del self.buckets[resource]
+                    return 0
+                # window over: assume a full budget until headers say otherwise
+                bucket.remaining = bucket.limit
+                bucket.reset = now + 15 * 60
+            if bucket.remaining > 0 or self.policy == TRACK:
+                bucket.remaining -= 1
+                return 0
+            if self.policy == RAISE:
+                raise RateLimitExceeded(resource, bucket.reset)
+            return bucket.reset - now + self.margin
+
+
+    def update(self, resource, headers, status_code=None):
+        """ Record the limits advertised by a response """
+        if resource is None:
+            return
+        try:
+            limit = int(headers['x-rate-limit-limit'])
+            remaining = int(headers['x-rate-limit-remaining'])
+            reset = int(headers['x-rate-limit-reset'])
+        except (KeyError, TypeError, ValueError):
+            if status_code != 429:
+                return
+            # rejected without headers: back off for a full window
+            limit, remaining, reset = 0, 0, int(self.clock()) + 15 * 60
+        if status_code == 429:
+            remaining = 0
+        with self.lock:
+            bucket = self.buckets.get(resource)
+            if bucket is None:
+                self.buckets[resource] = RateLimitBucket(limit, remaining, reset)
+            else:
+                bucket.limit = limit or bucket.limit
+                # concurrent replies may arrive out of order; keep the lowest count
+                if reset != bucket.reset or remaining < bucket.remaining:
+                    bucket.remaining = remaining
+                bucket.reset = reset
+
+
+    def load_status(self, status):
+        """ Seed buckets from a decoded application/rate_limit_status reply """
+        with self.lock:
+            for family in status.get('resources', {}).values():
+                for resource, limits in family.items():
+                    self.buckets[resource] = RateLimitBucket(limits['limit'],
+                            limits['remaining'], limits['reset'])
+
+
+    def delay(self, resource):
+        """ Return seconds until resource's window resets, plus the margin """
+        with self.lock:
+            bucket = self.buckets.get(resource)
+            if bucket is None:
+                return self.margin
+            return max(bucket.reset - self.clock(), 0) + self.margin
+
+
+    def remaining(self, resource):
+        """ Return the known remaining budget for resource, or None if unknown """
+        with self.lock:
+            bucket = self.buckets.get(resource)
+            if bucket is None:
+                return None
+            if self.clock() >= bucket.reset:
+                # a limit of 0 was never advertised (a header-less 429)
+                return bucket.limit or None
+            return bucket.remaining
+
+
+    def status(self):
+        """ Return bucket state grouped by family, shaped like rate_limit_status """
+        with self.lock:
+            resources = {}
+            for resource, bucket in self.buckets.items():
+                resources.setdefault(resource_family(resource), {})[resource] = bucket.as_dict()
+        return { 'resources' : resources }
@@ -1,3 +1,6 @@
+# Scheme and host shared by every resource URL below
+API_ROOT = 'https://api.twitter.com'
+
 # GET search/tweets
 SEARCH_TWEETS = 'https://api.twitter.com/1.1/search/tweets.json'
 
@@ -40,6 +43,9 @@ FRIENDSHIPS_DESTROY = 'https://api.twitter.com/1.1/friendships/destroy.json'
 # GET friendships/show
 FRIENDSHIPS_SHOW = 'https://api.twitter.com/1.1/friendships/show.json'
 
+# GET friendships/lookup
+FRIENDSHIPS_LOOKUP = 'https://api.twitter.com/1.1/friendships/lookup.json'
+
 # GET users/show
 USERS_SHOW = 'https://api.twitter.com/1.1/users/show.json'
 
@@ -51,3 +57,23 @@ ACCOUNT_SETTINGS = 'https://api.twitter.com/1.1/account/settings.json'
 
 # POST statuses/update
 STATUSES_UPDATE = 'https://api.twitter.com/1.1/statuses/update.json'
+
+
+def resource_name(url):
+    """ Return the rate-limit resource name for a URL above, in the form
+        used by application/rate_limit_status (e.g. '/friends/ids' or
+        '/statuses/retweet/:id'), or None for unversioned oauth URLs. """
+    path = url.split('?', 1)[0]
+    if path.startswith(API_ROOT):
+        path = path[len(API_ROOT):]
+    if not path.startswith('/1.1/'):
+        return None
+    path = path[len('/1.1'):]
+    if path.endswith('.json'):
+        path = path[:-len('.json')]
+    return '/'.join(':id' if part.isdigit() else part for part in path.split('/'))
+
+
+def resource_family(resource):
+    """ Return the resource family ('friends', 'users', ...) of a resource name """
+    return resource.split('/')[1]
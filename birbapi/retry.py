@@ -0,0 +1,99 @@
+""" Retry policy for transient request failures """
+import random
+import threading
+import time
+
+from birbapi.endpoints import ENDPOINTS
+
+
+# Resources of POST endpoints that only read (such as users/lookup, per
+# the endpoint table's write flag), and so are safe to resend
+IDEMPOTENT_POSTS = frozenset(endpoint.resource for endpoint in ENDPOINTS.values()
+        if endpoint.method == 'POST' and not endpoint.write and endpoint.resource is not None)
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class RetryPolicy():
+    """ Decides whether and when a failed request is sent again.
+
+        max_attempts: total tries per request, including the first
+        backoff: base delay; attempt n waits up to backoff * 2**n seconds
+        max_backoff: ceiling for the exponential delay
+        max_delay: give up instead of waiting longer than this, e.g. when
+                   a 429's rate-limit window resets in 15 minutes
+        jitter: randomize delays over [0, delay] ("full jitter") so
+                clients recovering from an outage don't retry in lockstep
+        retry_statuses: HTTP statuses treated as transient
+
+        Non-idempotent requests (anything but GET and read-only POSTs such
+        as users/lookup) are only resent when they provably never reached
+        Twitter: a failed connection attempt or a 429 rejection. That keeps
+        send_tweet and retweet from double-posting.
+
+        retries and give_ups count resends and abandoned requests.
+    """
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=30, max_delay=60, jitter=True,
+            retry_statuses=RETRY_STATUSES, clock=time.time, rand=random.random):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.clock = clock
+        self.rand = rand
+        self.retries = 0
+        self.give_ups = 0
+        self.lock = threading.Lock()
+
+
+    def idempotent(self, method, resource):
+        return method == 'GET' or resource in IDEMPOTENT_POSTS
+
+
+    def next_delay(self, attempt, idempotent, status=None, headers=None, sent=True):
+        """ Return seconds to wait before resending, or None to stop.
+
+            attempt: number of tries already made, minus one
+            status/headers: the response received, if any
+            sent: False if the request failed before reaching the server
+        """
+        if status is not None and status not in self.retry_statuses:
+            return None
+        if not idempotent and sent and status != 429:
+            return None
+
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        if self.jitter:
+            delay = delay * self.rand()
+        if headers is not None:
+            delay = max(delay, self.server_delay(headers))
+
+        if attempt + 1 >= self.max_attempts or delay > self.max_delay:
+            with self.lock:
+                self.give_ups += 1
+            return None
+        with self.lock:
+            self.retries += 1
+        return delay
+
+
+    def server_delay(self, headers):
+        """ Return the wait a response asks for via Retry-After or, on a
+            rate-limited reply, x-rate-limit-reset """
+        try:
+            return float(headers['Retry-After'])
+        except (KeyError, TypeError, ValueError):
+            pass
+        try:
+            if int(headers['x-rate-limit-remaining']) == 0:
+                return max(int(headers['x-rate-limit-reset']) - self.clock(), 0)
+        except (KeyError, TypeError, ValueError):
+            pass
+        return 0
+
+
+    def stats(self):
+        with self.lock:
+            return { 'retries' : self.retries, 'give_ups' : self.give_ups }
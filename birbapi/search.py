@@ -0,0 +1,42 @@
+""" Persistent since_id watermarks for incremental searches """
+import json
+import os
+import threading
+
+
+class SearchWatermarks():
+    """ Highest tweet ID seen per search query, so repeated polls with
+        Twitter.iter_search only fetch newer tweets.
+
+        path: JSON file to load from and save() to; None keeps the state
+              in memory only
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.since_ids = {}
+        self.lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self.since_ids = { q : int(since_id) for q, since_id in json.load(f).items() }
+
+    def get(self, q):
+        with self.lock:
+            return self.since_ids.get(q)
+
+    def update(self, q, since_id):
+        """ Raise q's watermark to since_id, saving it if a path is set """
+        with self.lock:
+            if since_id is None or since_id <= self.since_ids.get(q, 0):
+                return
+            self.since_ids[q] = since_id
+        if self.path is not None:
+            self.save()
+
+    def save(self):
+        """ Write the watermarks atomically, so a crash never leaves a torn file """
+        with self.lock:
+            data = json.dumps(self.since_ids)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
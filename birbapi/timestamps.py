@@ -0,0 +1,52 @@
+""" Parsing of Twitter's 'created_at' timestamps """
+import calendar
+import logging
+import time
+from array import array
+from functools import lru_cache
+
+
+MONTHS = { 'Jan' : 1, 'Feb' : 2, 'Mar' : 3, 'Apr' : 4, 'May' : 5, 'Jun' : 6,
+           'Jul' : 7, 'Aug' : 8, 'Sep' : 9, 'Oct' : 10, 'Nov' : 11, 'Dec' : 12 }
+
+
+@lru_cache(maxsize=8192)
+def _minute_timestamp(minute):
+    """ UTC timestamp of a 'Mon DD HH:MM +hhmm YYYY' minute """
+    if minute[13] not in '+-':
+        raise ValueError(minute)
+    timestamp = calendar.timegm((int(minute[19:]), MONTHS[minute[:3]], int(minute[4:6]),
+            int(minute[7:9]), int(minute[10:12]), 0))
+    offset = int(minute[14:16]) * 3600 + int(minute[16:18]) * 60
+    return timestamp - offset if minute[13] == '+' else timestamp + offset
+
+
+def timestr_to_timestamp(created_at):
+    """ Convert a Twitter-supplied 'created_at' time field to a timestamp
+
+        Parses the fixed 'Wed Aug 27 13:08:45 +0000 2008' layout by
+        position, honouring the embedded UTC offset. Everything but the
+        seconds is cached per minute, since tweets processed together
+        are mostly from the same few minutes.
+    """
+    try:
+        if len(created_at) != 30:
+            raise ValueError(created_at)
+        return float(_minute_timestamp(created_at[4:16] + created_at[19:]) + int(created_at[17:19]))
+    except (KeyError, TypeError, ValueError):
+        logging.warning('Twitter gave unsupported time string')
+        return time.time()
+
+
+def timestrs_to_timestamps(created_ats):
+    """ Convert many 'created_at' fields at once, returning an array('d') """
+    minute_timestamp = _minute_timestamp
+    timestamps = [0.0] * len(created_ats)
+    for index, created_at in enumerate(created_ats):
+        try:
+            if len(created_at) != 30:
+                raise ValueError(created_at)
+            timestamps[index] = minute_timestamp(created_at[4:16] + created_at[19:]) + int(created_at[17:19])
+        except (KeyError, TypeError, ValueError):
+            timestamps[index] = timestr_to_timestamp(created_at)
+    return array('d', timestamps)
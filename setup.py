@@ -13,6 +13,9 @@ setup(
     include_package_data=True,
     zip_safe=False,
     install_requires=['requests', 'requests-oauthlib'],
+    extras_require={
+        'async': ['aiohttp'],
+    },
     classifiers=[
         'Environment :: Console',
         'Intended Audience :: Developers',
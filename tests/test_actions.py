@@ -0,0 +1,80 @@
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from birbapi.actions import ActionQueue
+from birbapi.birbapi import Twitter, TwitterError
+from birbapi.ratelimit import RateLimiter, RateLimitBucket
+from test_birbapi import make_response, form_data
+
+
+class TestActionQueue():
+    def test_dedupes_coalesces_and_reports(self):
+        gate = threading.Event()
+        sent = []
+
+        def send(request, **kwargs):
+            gate.wait(5)
+            sent.append((request.url.rsplit('/', 1)[1], form_data(request)))
+            if request.url.endswith('favorites/destroy.json'):
+                return make_response({ 'errors' : [{ 'code' : 144, 'message' : 'No status found' }] }, 403)
+            return make_response({})
+
+        twitter = Twitter('key', 'secret')
+        twitter.session.send = send
+        with ActionQueue(twitter, workers=1, interval=0) as queue:
+            first = queue.follow(1)
+            follow = queue.follow(2)
+            assert queue.follow(2) is follow
+            unfollow = queue.unfollow(2)
+            liked = queue.favorite(9)
+            unliked = queue.unfavorite(10)
+            gate.set()
+            assert first.result(5).status_code == 200
+            assert unfollow.result(5).status_code == 200
+            assert liked.result(5).status_code == 200
+            with pytest.raises(TwitterError) as excinfo:
+                unliked.result(5)
+            assert excinfo.value.error_code == 144
+        # follow then unfollow ends unfollowed, even if 2 was followed before
+        with pytest.raises(CancelledError):
+            follow.result()
+        assert sent == [('create.json', { 'user_id' : '1' }), ('destroy.json', { 'user_id' : '2' }),
+                ('create.json', { 'id' : '9' }), ('destroy.json', { 'id' : '10' })]
+        assert queue.stats() == { 'submitted' : 6, 'deduplicated' : 1, 'coalesced' : 1,
+                'succeeded' : 3, 'failed' : 1, 'queued' : 0 }
+
+    def test_paces_by_interval_and_write_limits(self):
+        sent = []
+        twitter = Twitter('key', 'secret', rate_limiter=RateLimiter(margin=0))
+        twitter.session.send = lambda request, **kwargs: sent.append(time.monotonic()) or make_response({})
+        # a 429 left the follow bucket empty for another 0.2s
+        twitter.rate_limiter.buckets['/friendships/create'] = RateLimitBucket(0, 0, time.time() + 0.2)
+        start = time.monotonic()
+        with ActionQueue(twitter, workers=2, interval=0.1) as queue:
+            futures = [queue.favorite(1), queue.favorite(2), queue.follow(3)]
+            for future in futures:
+                future.result(5)
+        assert sorted(sent)[1] - sorted(sent)[0] >= 0.09
+        assert max(sent) - start >= 0.19
+
+    def test_favorites_destroy_accepts_not_favorited(self):
+        twitter = Twitter('key', 'secret')
+        twitter.session.send = lambda request, **kwargs: make_response({}, 404)
+        assert twitter.favorites_destroy(10).status_code == 404
+
+    def test_idle_group_is_not_held_up_by_a_backlog(self):
+        sent = []
+        twitter = Twitter('key', 'secret')
+        twitter.session.send = lambda request, **kwargs: \
+                sent.append((request.url.rsplit('/', 2)[1], time.monotonic())) or make_response({})
+        start = time.monotonic()
+        with ActionQueue(twitter, workers=2, interval=0.2) as queue:
+            for id in range(6):
+                queue.favorite(id)
+            queue.follow(1).result(5)
+            assert time.monotonic() - start < 0.15
+        likes = [at for kind, at in sent if kind == 'favorites']
+        assert len(likes) == 6 and likes[-1] - likes[0] >= 0.95
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+
+from birbapi.aio import AsyncTwitter
+from birbapi.birbapi import TwitterError
+
+
+async def serve(handler):
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, 'http://127.0.0.1:%d' % port
+
+
+class TestAsyncTwitter():
+    def test_concurrent_signed_requests(self):
+        seen = []
+        in_flight = [0, 0]
+
+        async def handler(request):
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+            seen.append((request.path, request.headers['Authorization']))
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            return web.json_response({ 'id' : int(request.query['user_id']) })
+
+        async def run():
+            runner, root = await serve(handler)
+            try:
+                async with AsyncTwitter('key', 'secret', 'token', 'tokensecret',
+                        max_concurrency=4, api_root=root) as twitter:
+                    responses = await asyncio.gather(*[twitter.users_show(i) for i in range(20)])
+            finally:
+                await runner.cleanup()
+            return [response.json()['id'] for response in responses]
+
+        assert asyncio.run(run()) == list(range(20))
+        assert in_flight[1] <= 4
+        assert all(path == '/1.1/users/show.json' for path, _ in seen)
+        assert all(auth.startswith('OAuth ') for _, auth in seen)
+
+    def test_error_response_raises_twitter_error(self):
+        async def handler(request):
+            body = { 'errors' : [{ 'code' : 34, 'message' : 'Sorry, that page does not exist' }] }
+            return web.json_response(body, status=404)
+
+        async def run():
+            runner, root = await serve(handler)
+            try:
+                async with AsyncTwitter('key', 'secret', api_root=root) as twitter:
+                    await twitter.users_lookup([1, 2, 3])
+            finally:
+                await runner.cleanup()
+
+        with pytest.raises(TwitterError) as excinfo:
+            asyncio.run(run())
+        assert excinfo.value.error_code == 34
+        assert excinfo.value.http_code == 404
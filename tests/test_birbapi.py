@@ -1,6 +1,122 @@
-from birbapi.birbapi import timestr_to_timestamp, Twitter, TwitterError, RequestsError
+import json
+import threading
+import time
+from urllib.parse import parse_qsl
+
+import pytest
+import requests
+
+from birbapi.birbapi import timestr_to_timestamp, timestrs_to_timestamps, Twitter, TwitterError, RequestsError
+
+
+def make_response(body, status_code=200, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body).encode()
+    response.headers.update(headers or {})
+    return response
+
+
+def form_data(request):
+    """ Return the decoded form body of a PreparedRequest as a dict """
+    return dict(parse_qsl(request.body.decode())) if request.body else {}
 
 
 class TestBirbAPI():
     def test_timestr_to_timestamp(self):
-        assert timestr_to_timestamp("Wed Aug 27 13:08:45 +0000 2008") == 1219867725.0
+        assert timestr_to_timestamp("Wed Aug 27 13:08:45 +0000 2008") == 1219842525.0
+        assert timestr_to_timestamp("Wed Aug 27 06:08:45 -0700 2008") == 1219842525.0
+        assert timestr_to_timestamp("Thu Aug 28 00:38:45 +1130 2008") == 1219842525.0
+
+    def test_timestrs_to_timestamps(self):
+        timestamps = timestrs_to_timestamps(["Wed Aug 27 13:08:45 +0000 2008",
+                "Thu Feb 29 23:59:59 +0000 2024"])
+        assert timestamps.typecode == 'd'
+        assert list(timestamps) == [1219842525.0, 1709251199.0]
+
+    def test_session_pool_configuration(self):
+        twitter = Twitter('key', 'secret', pool_connections=3, pool_maxsize=7, max_retries=2)
+        adapter = twitter.session.get_adapter('https://api.twitter.com/1.1/users/show.json')
+        assert adapter._pool_connections == 3
+        assert adapter._pool_maxsize == 7
+        assert adapter.max_retries.total == 2
+        assert twitter.session.auth is twitter.oauth
+
+    def test_session_built_once_across_threads(self):
+        twitter = Twitter('key', 'secret')
+        built = []
+        build_session = twitter.build_session
+
+        def slow_build(*args):
+            built.append(True)
+            time.sleep(0.05)
+            return build_session(*args)
+        twitter.build_session = slow_build
+        sessions = []
+        threads = [threading.Thread(target=lambda: sessions.append(twitter.session)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(built) == 1 and len(set(map(id, sessions))) == 1
+
+    def test_context_manager_closes_session(self):
+        closed = []
+        with Twitter('key', 'secret') as twitter:
+            twitter.session.close = lambda: closed.append(True)
+        assert closed == [True]
+
+    def test_error_body_uses_client_decoder(self):
+        decoded = []
+
+        def decoder(content):
+            decoded.append(content)
+            return json.loads(content)
+
+        twitter = Twitter('key', 'secret', decoder=decoder)
+        twitter.session.send = lambda request, **kwargs: \
+                make_response({ 'errors' : [{ 'code' : 50, 'message' : 'User not found.' }] }, 404)
+        with pytest.raises(TwitterError) as excinfo:
+            twitter.follow_user(12)
+        e = excinfo.value
+        assert (e.http_code, e.error_code, e.error_msg) == (404, 50, 'User not found.')
+        assert len(decoded) == 1
+
+    def test_iter_follower_ids_pages_and_resumes(self):
+        pages = {
+            -1 : { 'ids' : [1, 2, 3], 'next_cursor' : 11, 'previous_cursor' : 0 },
+            11 : { 'ids' : [4, 5], 'next_cursor' : 0, 'previous_cursor' : -11 },
+        }
+        twitter = Twitter('key', 'secret')
+        twitter.session.send = lambda request, **kwargs: \
+                make_response(pages[int(request.url.rsplit('=', 1)[1])])
+
+        result = list(twitter.iter_follower_ids(12))
+        assert [list(page.ids) for page in result] == [[1, 2, 3], [4, 5]]
+        assert result[0].ids.typecode == 'q'
+        assert [page.next_cursor for page in result] == [11, 0]
+        assert [list(page.ids) for page in twitter.iter_follower_ids(12, cursor=11)] == [[4, 5]]
+
+        assert twitter.get_followers_recursive('12') == \
+                { 'followers' : ['1', '2', '3', '4', '5'], 'cursor' : '0' }
+        assert len(twitter.get_followers_recursive('12')['followers']) == 5
+
+    def test_hydrate_users_batches_dedupes_and_orders(self):
+        requested = []
+
+        def send(request, **kwargs):
+            ids = [int(user_id) for user_id in form_data(request)['user_id'].split(',')]
+            requested.append(ids)
+            # Twitter omits unknown users and doesn't preserve request order
+            return make_response([{ 'id' : user_id } for user_id in reversed(ids) if user_id % 7])
+
+        twitter = Twitter('key', 'secret')
+        twitter.session.send = send
+        user_ids = list(range(1, 251)) + ['5', 17]
+
+        users = list(twitter.hydrate_users(user_ids, workers=3))
+        assert [user['id'] for user in users] == [i for i in range(1, 251) if i % 7]
+        assert sorted(len(batch) for batch in requested) == [50, 100, 100]
+
+        unordered = twitter.hydrate_users(user_ids, workers=3, ordered=False)
+        assert sorted(user['id'] for user in unordered) == [i for i in range(1, 251) if i % 7]
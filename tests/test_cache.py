@@ -0,0 +1,70 @@
+import json
+
+from birbapi.birbapi import Twitter
+from birbapi.cache import MemoryCache, SQLiteCache, ResponseCache
+from test_birbapi import make_response, form_data
+
+
+class TestCache():
+    def test_memory_cache_ttl_and_lru(self):
+        now = [1000]
+        cache = MemoryCache(max_entries=2, clock=lambda: now[0])
+        cache.set('a', b'1', 10)
+        cache.set('b', b'2', 10)
+        assert cache.get('a') == b'1'
+        cache.set('c', b'3', 10)
+        assert cache.get('b') is None
+        assert cache.get('a') == b'1'
+        now[0] = 1010
+        assert cache.get('a') is None
+
+    def test_memory_cache_byte_bound(self):
+        cache = MemoryCache(max_bytes=5)
+        cache.set('a', b'123', 10)
+        cache.set('b', b'456', 10)
+        assert cache.get('a') is None
+        assert cache.size == 3
+
+    def test_sqlite_cache_shared_between_instances(self, tmp_path):
+        path = str(tmp_path / 'cache.db')
+        SQLiteCache(path).set('k', b'value', 60)
+        assert SQLiteCache(path).get('k') == b'value'
+        assert SQLiteCache(path).get('missing') is None
+
+    def test_read_endpoint_served_from_cache(self):
+        calls = []
+        twitter = Twitter('key', 'secret', cache=ResponseCache())
+        twitter.session.send = lambda request, **kwargs: \
+                calls.append(request.url) or make_response({ 'id' : 12 })
+
+        assert twitter.users_show(12).json() == { 'id' : 12 }
+        assert twitter.users_show(12).json() == { 'id' : 12 }
+        assert len(calls) == 1
+        assert twitter.cache.stats() == { 'hits' : 1, 'misses' : 1 }
+
+    def test_users_lookup_fetches_only_misses(self):
+        requested = []
+
+        def send(request, **kwargs):
+            user_ids = form_data(request)['user_id']
+            requested.append(user_ids)
+            return make_response([{ 'id' : int(i) } for i in user_ids.split(',')])
+
+        twitter = Twitter('key', 'secret', cache=ResponseCache())
+        twitter.session.send = send
+        twitter.users_lookup([1, 2])
+        users = twitter.users_lookup([1, 2, 3]).json()
+        assert sorted(user['id'] for user in users) == [1, 2, 3]
+        assert requested == ['1,2', '3']
+        assert json.loads(twitter.users_lookup([3, 1]).content) == [{ 'id' : 3 }, { 'id' : 1 }]
+        assert len(requested) == 2
+
+    def test_accounts_do_not_share_entries(self, tmp_path):
+        cache = ResponseCache(SQLiteCache(str(tmp_path / 'cache.db')))
+        clients = [Twitter('key', 'secret', 'token%d' % i, 'tokensecret', cache=cache) for i in range(2)]
+        for i, twitter in enumerate(clients):
+            twitter.session.send = lambda request, i=i, **kwargs: \
+                    make_response([{ 'id' : 1, 'following' : bool(i) }])
+        assert [twitter.users_lookup([1]).json()[0]['following'] for twitter in clients] == [False, True]
+        assert [twitter.users_lookup([1]).json()[0]['following'] for twitter in clients] == [False, True]
+        assert cache.stats() == { 'hits' : 2, 'misses' : 2 }
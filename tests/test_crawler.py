@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import time
+
+from birbapi.crawler import ShardedCrawler, SharedRateBudget
+from birbapi.fakeserver import FakeTwitterServer
+from birbapi.ratelimit import RAISE, RateLimitBucket, RateLimitExceeded
+
+CREDENTIALS = [('key', 'secret', 'token', 'tokensecret')]
+
+
+def spend_budget(budget, count):
+    limiter = budget.limiter(0, policy=RAISE, margin=0)
+    for _ in range(count):
+        try:
+            limiter.reserve('/users/lookup')
+        except RateLimitExceeded:
+            pass
+
+
+def count_users(unit, users):
+    return len(users)
+
+
+def crash_on_13(unit, users):
+    if unit[1] == [13]:
+        os._exit(3)
+    return len(users)
+
+
+class TestSharedRateBudget():
+    def test_processes_spend_one_budget(self):
+        budget = SharedRateBudget(2)
+        limiter = budget.limiter(0, policy=RAISE, margin=0)
+        limiter.buckets['/users/lookup'] = RateLimitBucket(10, 10, time.time() + 60)
+        workers = [multiprocessing.Process(target=spend_budget, args=(budget, 8)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert limiter.buckets.get('/users/lookup').remaining == 0
+        # the other account's budget is untouched
+        assert budget.limiter(1).buckets.get('/users/lookup') is None
+
+
+class TestShardedCrawler():
+    def test_units_are_spread_and_budget_tracked(self):
+        with FakeTwitterServer(followers=3000) as server:
+            with ShardedCrawler(CREDENTIALS, processes=2, api_root=server.root) as crawler:
+                users = [user['id'] for batch in crawler.hydrate(range(1, 1001)) for user in batch]
+                assert sorted(users) == list(range(1, 1001))
+                followers = dict(crawler.follower_ids([7, 8]))
+                assert list(followers[8]) == list(range(3000, 0, -1))
+
+                failed = list(crawler.run([('hydrate', [1]), ('bogus',)]))
+                assert sorted(result.error is None for result in failed) == [False, True]
+
+                bucket = crawler.budget.limiter(0).buckets.get('/users/lookup')
+                assert (bucket.limit, bucket.remaining) == (900, 900 - 11)
+            assert not any(worker.is_alive() for worker in crawler.workers)
+
+    def test_handler_and_abandoned_run(self):
+        with FakeTwitterServer(limits=False) as server:
+            crawler = ShardedCrawler(CREDENTIALS, processes=2, handler=count_users, api_root=server.root)
+            results = crawler.run(('hydrate', [id]) for id in range(1, 21))
+            assert next(results).result == 1
+            results.close()
+            # four units were handed out; those not started are resumed,
+            # and none is sent twice
+            unfinished = len(crawler.unfinished)
+            assert sum(crawler.results_of(crawler.resume())) == unfinished
+            assert crawler.close() == []
+            assert server.requests == 4
+
+    def test_dead_worker_is_replaced(self):
+        with FakeTwitterServer(limits=False) as server:
+            with ShardedCrawler(CREDENTIALS, processes=2, handler=crash_on_13, api_root=server.root) as crawler:
+                results = list(crawler.run(('hydrate', [id]) for id in range(1, 21)))
+                failed = [result for result in results if result.error is not None]
+                assert [(result.unit, result.error) for result in failed] == \
+                        [(('hydrate', [13]), 'Worker exited with code 3')]
+                assert sum(result.result for result in results if result.error is None) == 19
+                assert all(worker.is_alive() for worker in crawler.workers)
@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from birbapi.decoding import get_decoder, decode_ids
+from birbapi.errors import TwitterError
+from test_birbapi import make_response
+
+
+class TestDecoding():
+    def test_get_decoder(self):
+        assert get_decoder('json') is json.loads
+        assert get_decoder()(b'{"a": [1]}') == { 'a' : [1] }
+        custom = lambda content: 'decoded'
+        assert get_decoder(custom) is custom
+        with pytest.raises(ValueError):
+            get_decoder('yaml')
+
+    def test_decode_ids(self):
+        body = json.dumps({ 'ids' : [2 ** 62, 7, 1], 'next_cursor' : 1510, 'next_cursor_str' : '1510',
+                'previous_cursor' : -4, 'previous_cursor_str' : '-4' }).encode()
+        ids, next_cursor, previous_cursor = decode_ids(body)
+        assert ids.typecode == 'q'
+        assert list(ids) == [2 ** 62, 7, 1]
+        assert (next_cursor, previous_cursor) == (1510, -4)
+        assert list(decode_ids(b'{"ids":[],"next_cursor":0,"previous_cursor":0}')[0]) == []
+
+    def test_twitter_error_with_non_json_body(self):
+        response = make_response(None, 503)
+        response._content = b'<html>Over capacity</html>'
+        error = TwitterError(response)
+        assert (error.http_code, error.error_code) == (503, 0)
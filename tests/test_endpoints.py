@@ -0,0 +1,62 @@
+import re
+
+from oauthlib.oauth1 import Client
+
+from birbapi.birbapi import Twitter
+from birbapi.endpoints import ENDPOINTS, encode_params
+from birbapi.fakeserver import FakeTwitterServer
+from birbapi.signing import OAuthSigner, PREFIX_CACHE_SIZE, escape
+from test_birbapi import make_response
+
+
+def signature(authorization):
+    return re.search(r'oauth_signature="([^"]+)"', authorization).group(1)
+
+
+class TestEndpoints():
+    def test_build_encodes_and_drops_none(self):
+        assert encode_params({ 'q' : 'birbs & co, 🐦', 'lang' : None, 'count' : 5 }) == \
+                'q=birbs%20%26%20co%2C%20%F0%9F%90%A6&count=5'
+        url, body = ENDPOINTS['retweet'].build({}, 12)
+        assert (url, body) == ('https://api.twitter.com/1.1/statuses/retweet/12.json', 'trim_user=1')
+        assert ENDPOINTS['retweet'].resource == '/statuses/retweet/:id'
+        assert ENDPOINTS['users_lookup'].family == 'users' and not ENDPOINTS['users_lookup'].write
+
+    def test_signature_matches_oauthlib(self):
+        url = 'https://api.twitter.com/1.1/statuses/update.json?' + encode_params({ 'x' : 'a b' })
+        body = encode_params({ 'status' : 'hello, birbs! ~*', 'trim_user' : 1 })
+        for token, token_secret, verifier in ((None, None, None), ('token', 'token secret', None),
+                ('token', 'token secret', 'verifier')):
+            client = Client('key', 'consumer secret', token, token_secret, verifier=verifier,
+                    nonce='abc', timestamp='1700000000')
+            signer = OAuthSigner('key', 'consumer secret', token, token_secret, verifier,
+                    clock=lambda: 1700000000, nonce=lambda: 'abc')
+            _, headers, _ = client.sign(url, 'POST', body,
+                    { 'Content-Type' : 'application/x-www-form-urlencoded' })
+            assert signature(signer.authorization('POST', url, body)) == \
+                    signature(headers['Authorization'])
+
+    def test_prepared_requests_are_signed_per_call(self):
+        sent = []
+        twitter = Twitter('key', 'secret', 'token', 'tokensecret')
+        twitter.session.send = lambda request, **kwargs: sent.append(request) or make_response({})
+        twitter.users_show(1)
+        twitter.users_show(2)
+        twitter.send_tweet('hi there')
+        for id in range(300):
+            twitter.retweet(id)
+        assert [request.url for request in sent[:2]] == [
+                'https://api.twitter.com/1.1/users/show.json?user_id=1',
+                'https://api.twitter.com/1.1/users/show.json?user_id=2']
+        assert signature(sent[0].headers['Authorization']) != signature(sent[1].headers['Authorization'])
+        assert sent[2].body == b'status=hi%20there&trim_user=1'
+        assert len(twitter.prepared) == 3
+        assert sent[-1].url == 'https://api.twitter.com/1.1/statuses/retweet/299.json'
+        assert len(twitter.signer.prefixes) <= PREFIX_CACHE_SIZE
+
+    def test_query_reaches_server_intact(self):
+        with FakeTwitterServer(tweets=3, limits=False) as server:
+            with Twitter('key', 'secret', 'token', 'tokensecret', api_root=server.root) as twitter:
+                q = 'birbs & co, ' + escape('#')
+                statuses = twitter.search_tweets(q, count=1, lang=None).json()['statuses']
+        assert statuses[0]['text'] == 'tweet 3 about ' + q
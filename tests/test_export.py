@@ -0,0 +1,75 @@
+import gzip
+import json
+
+import pytest
+
+from birbapi.birbapi import Twitter
+from birbapi.export import NDJSONWriter, export_search, export_followers, project
+from birbapi.fakeserver import FakeTwitterServer
+
+
+def read_lines(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        return [json.loads(line) for line in f]
+
+
+class TestExport():
+    def test_project(self):
+        record = { 'id' : 1, 'user' : { 'screen_name' : 'birb' }, 'entities' : [] }
+        assert project(record, ['id', 'user.screen_name', 'user.missing', 'entities.urls']) == \
+                { 'id' : 1, 'user.screen_name' : 'birb', 'user.missing' : None, 'entities.urls' : None }
+
+    def test_checkpoint_truncates_unflushed_tail(self, tmp_path):
+        path = str(tmp_path / 'out.ndjson.gz')
+        writer = NDJSONWriter(path, buffer_size=1)
+        writer.write_all({ 'id' : i } for i in range(3))
+        writer.checkpoint({ 'cursor' : 7 })
+        # written but never checkpointed, as if the process died here
+        writer.write_all({ 'id' : i } for i in range(3, 6))
+        writer.close()
+
+        writer = NDJSONWriter(path)
+        assert writer.state == { 'cursor' : 7 } and writer.records == 3
+        writer.write({ 'id' : 3 })
+        writer.checkpoint({ 'cursor' : 0 })
+        writer.close()
+        assert [record['id'] for record in read_lines(path)] == [0, 1, 2, 3]
+
+    def test_resumed_exports_match_uninterrupted_ones(self, tmp_path):
+        with FakeTwitterServer(followers=12000, tweets=450, limits=False) as server:
+            with Twitter('key', 'secret', 'token', 'tokensecret', api_root=server.root) as twitter:
+                path = str(tmp_path / 'search.ndjson')
+                with NDJSONWriter(path, fields=['id', 'user.id']) as writer:
+                    interrupt_after(writer, 2)
+                    with pytest.raises(KeyboardInterrupt):
+                        export_search(twitter, 'birbs', writer, count=100)
+                with NDJSONWriter(path, fields=['id', 'user.id']) as writer:
+                    assert writer.state['max_id'] == 250
+                    assert export_search(twitter, 'birbs', writer, count=100) == 450
+                records = read_lines(path)
+                assert [record['id'] for record in records] == list(range(450, 0, -1))
+                assert set(records[0]) == { 'id', 'user.id' }
+
+                path = str(tmp_path / 'followers.ndjson.gz')
+                with NDJSONWriter(path) as writer:
+                    interrupt_after(writer, 1)
+                    with pytest.raises(KeyboardInterrupt):
+                        export_followers(twitter, 12, writer)
+                with NDJSONWriter(path) as writer:
+                    assert writer.state == { 'cursor' : 2 }
+                    assert export_followers(twitter, 12, writer) == 12000
+                assert [user['id'] for user in read_lines(path)] == list(range(12000, 0, -1))
+
+
+def interrupt_after(writer, checkpoints):
+    """ Make writer die right after its nth checkpoint """
+    checkpoint = writer.checkpoint
+    count = [0]
+
+    def checkpoint_then_stop(state):
+        checkpoint(state)
+        count[0] += 1
+        if count[0] == checkpoints:
+            raise KeyboardInterrupt
+    writer.checkpoint = checkpoint_then_stop
@@ -0,0 +1,51 @@
+from itertools import chain
+
+import pytest
+
+from birbapi.birbapi import Twitter, TwitterError
+from birbapi.fakeserver import FakeTwitterServer
+from birbapi.ratelimit import RateLimiter, RateLimitExceeded
+
+
+@pytest.fixture
+def server():
+    with FakeTwitterServer(followers=12000, tweets=250, missing_after=11990) as server:
+        yield server
+
+
+def client(server, **kwargs):
+    return Twitter('key', 'secret', 'token', 'tokensecret', api_root=server.root, **kwargs)
+
+
+class TestFakeServer():
+    def test_pages_hydrates_and_searches(self, server):
+        with client(server) as twitter:
+            pages = list(twitter.iter_follower_ids(12))
+            assert [len(page.ids) for page in pages] == [5000, 5000, 2000]
+            assert pages[0].ids[0] == 12000 and pages[-1].ids[-1] == 1 and pages[-1].next_cursor == 0
+
+            ids = chain.from_iterable(page.ids for page in twitter.iter_friend_ids(12))
+            users = list(twitter.hydrate_users(ids, models=True))
+            # IDs at or above missing_after come back as deleted users
+            assert [user.id for user in users[:3]] == [11988, 11986, 11984]
+            assert len(users) == 5994
+
+            tweets = list(chain.from_iterable(twitter.iter_search('birbs', count=100)))
+            assert [tweet['id'] for tweet in tweets] == list(range(250, 0, -1))
+
+    def test_rate_limits(self, server):
+        server.limits['/users/show'] = 2
+        with client(server, rate_limiter=RateLimiter()) as twitter:
+            twitter.users_show(12)
+            twitter.users_show(12)
+            assert twitter.rate_limiter.remaining('/users/show') == 0
+            with pytest.raises(RateLimitExceeded):
+                twitter.users_show(12)
+        assert server.requests == 2
+
+    def test_error_injection(self):
+        with FakeTwitterServer(error_rate=1) as server:
+            with client(server) as twitter:
+                with pytest.raises(TwitterError) as raised:
+                    twitter.users_show(12)
+        assert raised.value.http_code == 503
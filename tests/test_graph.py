@@ -0,0 +1,81 @@
+from array import array
+
+from birbapi.birbapi import Twitter
+from birbapi.fakeserver import FakeTwitterServer
+from birbapi.graph import HEAD_SIZE, SocialGraph, Snapshot, difference, intersection, merge, union
+from birbapi.models import FOLLOWING, FOLLOWED_BY
+
+
+class TestMerges():
+    def test_sorted_set_operations(self):
+        a, b = array('q', [1, 3, 5, 7, 9]), array('q', [2, 3, 4, 9, 11])
+        assert list(difference(a, b)) == [1, 5, 7]
+        assert list(intersection(a, b)) == [3, 9]
+        assert list(union(a, b)) == [1, 2, 3, 4, 5, 7, 9, 11]
+        assert list(merge([a, b, array('q', [0, 11])])) == [0, 1, 2, 3, 4, 5, 7, 9, 11]
+
+    def test_snapshot_dedupes_across_pages(self):
+        ids = list(range(HEAD_SIZE * 2, 0, -1)) + list(range(1, HEAD_SIZE + 1))
+        snapshot = Snapshot.from_ids(ids)
+        assert list(snapshot) == list(range(1, HEAD_SIZE * 2 + 1))
+        assert list(snapshot.head) == ids[:HEAD_SIZE]
+
+    def test_snapshot_roundtrip_is_mapped(self, tmp_path):
+        path = str(tmp_path / 'followers-12')
+        Snapshot.from_ids([30, 10, 20, 10]).save(path)
+        snapshot = Snapshot.load(path)
+        assert list(snapshot) == [10, 20, 30] and list(snapshot.head) == [30, 10, 20, 10]
+        assert 20 in snapshot and 15 not in snapshot
+        assert snapshot.mapping is not None
+        snapshot.close()
+
+
+class TestSocialGraph():
+    def test_incremental_and_full_refresh(self, tmp_path):
+        with FakeTwitterServer(followers=12000, limits=False) as server:
+            with Twitter('key', 'secret', 'token', 'tokensecret', api_root=server.root) as twitter:
+                graph = SocialGraph(twitter, str(tmp_path))
+                first = graph.refresh('followers', 12)
+                assert len(first.added) == 12000 and first.complete
+
+                # 50 new followers arrive at the top of the list
+                server.followers = 12050
+                requests = server.requests
+                diff = graph.refresh('followers', 12)
+                assert list(diff.added) == list(range(12001, 12051))
+                assert not diff.complete and not diff.removed
+                assert server.requests == requests + 1
+
+                users = list(graph.hydrate(diff, models=True))
+                assert sorted(user.id for user in users) == list(diff.added)
+
+                # losing followers shows up on a full refresh only
+                server.followers = 11990
+                diff = graph.refresh('followers', 12, full=True)
+                assert list(diff.removed) == list(range(11991, 12051)) and not diff.added
+                assert len(graph.load('followers', 12)) == 11990
+
+                graph.refresh('friends', 12)
+                assert len(graph.mutuals(12)) == 5995
+
+
+class TestRelationships():
+    def test_batched_lookup_and_snapshot_fallback(self, tmp_path):
+        with FakeTwitterServer(followers=1000, missing_after=1200, limits=False) as server:
+            with Twitter('key', 'secret', 'token', 'tokensecret', api_root=server.root) as twitter:
+                targets = list(range(1, 1251))
+                requests = server.requests
+                flags = twitter.relationships(targets)
+                # 13 batches, the last holding only missing users
+                assert server.requests == requests + 13
+                assert len(flags) == 1199
+                assert flags[1000] == FOLLOWING | FOLLOWED_BY
+                assert flags[999] == FOLLOWED_BY and flags[1100] == 0
+
+                graph = SocialGraph(twitter, str(tmp_path))
+                graph.refresh('followers', 12)
+                graph.refresh('friends', 12)
+                requests = server.requests
+                local = graph.relationships(12, targets[:1199])
+                assert server.requests == requests
+                assert local == flags
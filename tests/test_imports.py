@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative -X importtime budget for birbapi.birbapi, in microseconds.
+# requests and requests_oauthlib alone take well over this.
+IMPORT_BUDGET = 100000
+
+HEAVY_MODULES = ['requests', 'requests_oauthlib', 'oauthlib', 'urllib3', 'ssl', 'sqlite3', 'prometheus_client']
+
+
+def run_python(*args):
+    return subprocess.run([sys.executable] + list(args), cwd=ROOT, capture_output=True, text=True,
+            check=True)
+
+
+def loaded_heavy_modules(code):
+    """ Run code in a fresh interpreter; return the HEAVY_MODULES it loaded """
+    output = run_python('-c', code + '\nimport sys\nprint(",".join(m for m in %r if m in sys.modules))'
+            % HEAVY_MODULES).stdout
+    last = output.splitlines()[-1]
+    return last.split(',') if last else []
+
+
+class TestImports():
+    def test_heavy_dependencies_wait_for_first_use(self):
+        assert loaded_heavy_modules('import birbapi\n'
+                'print(birbapi.timestr_to_timestamp("Wed Aug 27 13:08:45 +0000 2008"), birbapi.API_ROOT)\n'
+                'twitter = birbapi.Twitter("key", "secret", "token", "tokensecret")\n'
+                'twitter.signer.authorization("GET", birbapi.API_ROOT + "/users/show.json")\n'
+                'twitter.close()') == []
+        assert set(loaded_heavy_modules('import birbapi\n'
+                'birbapi.Twitter("key", "secret").session')) >= { 'requests', 'requests_oauthlib' }
+
+    def test_namespace(self):
+        import birbapi
+        from birbapi.birbapi import Twitter
+        assert birbapi.Twitter is Twitter
+        assert 'timestr_to_timestamp' in dir(birbapi)
+        with pytest.raises(AttributeError):
+            birbapi.missing
+        assert run_python('-c', 'import birbapi; print(birbapi.birbapi.Twitter("key", "secret").consumer_key)'
+                ).stdout.strip() == 'key'
+
+    def test_import_time_budget(self):
+        samples = []
+        for _ in range(3):
+            stderr = run_python('-X', 'importtime', '-c', 'import birbapi.birbapi').stderr
+            for line in stderr.splitlines():
+                fields = line.split('|')
+                if fields[-1].strip() == 'birbapi.birbapi':
+                    samples.append(int(fields[1]))
+        assert min(samples) < IMPORT_BUDGET, stderr
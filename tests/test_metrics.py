@@ -0,0 +1,51 @@
+import pytest
+import requests
+
+from birbapi.birbapi import Twitter, RequestsError
+from birbapi.cache import ResponseCache
+from birbapi.metrics import StatsAggregator
+from birbapi.retry import RetryPolicy
+from test_birbapi import make_response
+
+
+class TestMetrics():
+    def test_events_and_aggregation(self, monkeypatch):
+        monkeypatch.setattr('birbapi.birbapi.time.sleep', lambda seconds: None)
+        events = []
+        stats = StatsAggregator()
+        replies = [make_response({}, 503), make_response({ 'id' : 1 },
+                headers={ 'x-rate-limit-limit' : '900', 'x-rate-limit-remaining' : '899',
+                          'x-rate-limit-reset' : '1700000000' })]
+
+        def send(request, **kwargs):
+            if 'friends' in request.url:
+                raise requests.exceptions.ConnectionError('reset by peer')
+            return replies.pop(0)
+
+        twitter = Twitter('key', 'secret', hooks=[events.append, stats],
+                cache=ResponseCache(), retry=RetryPolicy(max_attempts=2, jitter=False))
+        twitter.session.send = send
+        twitter.users_show(1)
+        twitter.users_show(1)
+        with pytest.raises(RequestsError):
+            twitter.friends_ids(1)
+
+        live, cached, failed = events
+        assert (live.resource, live.method, live.status, live.retries) == ('/users/show', 'GET', 200, 1)
+        assert live.rate_limit == (900, 899, 1700000000)
+        assert live.bytes == len(b'{"id": 1}')
+        assert cached.cached and not cached.failed
+        assert failed.failed and isinstance(failed.error, RequestsError) and failed.retries == 1
+
+        summary = stats.summary()
+        assert summary['/users/show']['requests'] == 2
+        assert summary['/users/show']['error_rate'] == 0
+        assert summary['/users/show']['p50'] is not None
+        assert summary['/friends/ids']['error_rate'] == 1
+
+    def test_failing_hook_is_contained(self):
+        def broken(event):
+            raise RuntimeError('boom')
+        twitter = Twitter('key', 'secret', hooks=[broken])
+        twitter.session.send = lambda request, **kwargs: make_response({})
+        assert twitter.users_show(1).status_code == 200
@@ -0,0 +1,36 @@
+import json
+
+from birbapi.models import Tweet, User, tweets_from_response, relationship_from_response
+from test_birbapi import make_response
+
+
+TWEET = { 'id' : 10, 'created_at' : 'Wed Aug 27 13:08:45 +0000 2008', 'text' : 'chirp',
+        'user' : { 'id' : 12, 'screen_name' : 'birb', 'description' : 'x' * 500 },
+        'retweet_count' : 3, 'entities' : { 'hashtags' : [] } }
+
+
+class TestModels():
+    def test_lazy_decode_from_raw(self):
+        tweet = Tweet(json.dumps(TWEET).encode())
+        assert not tweet.decoded
+        assert tweet.user_id == 12
+        assert tweet.decoded
+        assert tweet.timestamp == 1219842525.0
+        assert tweet.data['user']['screen_name'] == 'birb'
+        assert not hasattr(tweet, '__dict__')
+
+    def test_from_dict_drops_nested_objects(self):
+        tweets = tweets_from_response(make_response({ 'statuses' : [TWEET] }))
+        assert (tweets[0].id, tweets[0].text, tweets[0].user_id) == (10, 'chirp', 12)
+        assert tweets[0].data is None
+        user = User.from_dict(TWEET['user'], keep_raw=True)
+        assert user.screen_name == 'birb'
+        assert user.data['description'] == 'x' * 500
+
+    def test_relationship(self):
+        body = { 'relationship' : {
+            'source' : { 'id' : 1, 'following' : True, 'followed_by' : False },
+            'target' : { 'id' : 2, 'following' : False, 'followed_by' : True } } }
+        relationship = relationship_from_response(make_response(body))
+        assert (relationship.source_id, relationship.target_id) == (1, 2)
+        assert relationship.following and not relationship.followed_by
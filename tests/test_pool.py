@@ -0,0 +1,67 @@
+import pytest
+
+from birbapi.birbapi import Twitter
+from birbapi.errors import TwitterError
+from birbapi.pool import TwitterPool
+from birbapi.ratelimit import RateLimiter, RateLimitExceeded
+from test_birbapi import make_response
+
+
+def limits(remaining, reset=4102444800):
+    return { 'x-rate-limit-limit' : '900', 'x-rate-limit-remaining' : str(remaining),
+            'x-rate-limit-reset' : str(reset) }
+
+
+def account(pool, index, replies):
+    """ Point a pool client at a queue of canned responses """
+    client = pool.clients[index]
+    calls = []
+
+    def send(request, **kwargs):
+        calls.append(request.url)
+        return replies.pop(0)
+    client.session.send = send
+    return calls
+
+
+class TestTwitterPool():
+    def test_routes_to_most_remaining_and_fails_over(self):
+        pool = TwitterPool([('key', 'secret', 'token%d' % i, 'tokensecret') for i in range(3)], wait=False)
+        first = account(pool, 0, [make_response({ 'id' : 0 }, headers=limits(5))] * 3)
+        second = account(pool, 1, [make_response({ 'id' : 1 }, headers=limits(50))] * 3)
+        suspended = { 'errors' : [{ 'code' : 64, 'message' : 'Your account is suspended' }] }
+        third = account(pool, 2, [make_response(suspended, 403)])
+
+        # unknown budgets count as full, so each account is tried once; the
+        # suspended one is dropped and its call goes to the fullest account
+        assert [pool.users_show(1).json()['id'] for _ in range(3)] == [0, 1, 1]
+        assert len(third) == 1
+        assert pool.users_show(1).json()['id'] == 1
+        assert (len(first), len(second), len(third)) == (1, 3, 1)
+
+    def test_rejects_a_shared_rate_limiter(self):
+        with pytest.raises(ValueError):
+            TwitterPool([('key', 'secret', 'token%d' % i, 'tokensecret') for i in range(2)],
+                    rate_limiter=RateLimiter())
+
+    def test_raises_when_all_limited(self):
+        pool = TwitterPool([('key', 'secret', 'token', 'tokensecret')], wait=False)
+        limited = { 'errors' : [{ 'code' : 88, 'message' : 'Rate limit exceeded' }] }
+        calls = account(pool, 0, [make_response(limited, 429, limits(0))])
+        with pytest.raises(TwitterError):
+            pool.followers_ids(12)
+        with pytest.raises(RateLimitExceeded):
+            pool.followers_ids(12)
+        assert len(calls) == 1
+
+    def test_recovers_after_headerless_429(self):
+        now = [1000000]
+        pool = TwitterPool([Twitter('key', 'secret', 'token', 'tokensecret',
+                rate_limiter=RateLimiter(clock=lambda: now[0]))], wait=False)
+        limited = { 'errors' : [{ 'code' : 88, 'message' : 'Rate limit exceeded' }] }
+        calls = account(pool, 0, [make_response(limited, 429), make_response({ 'id' : 12 })])
+        with pytest.raises(RateLimitExceeded):
+            pool.users_show(12)
+        now[0] += 15 * 60
+        assert pool.users_show(12).json()['id'] == 12
+        assert len(calls) == 2
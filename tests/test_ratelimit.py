@@ -0,0 +1,52 @@
+import pytest
+
+from birbapi.errors import TwitterError
+from birbapi.ratelimit import RateLimiter, RateLimitExceeded
+from birbapi.resource_urls import resource_name, FRIENDS_IDS, STATUSES_RETWEET
+
+
+class Clock():
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def headers(limit, remaining, reset):
+    return { 'x-rate-limit-limit' : str(limit), 'x-rate-limit-remaining' : str(remaining),
+            'x-rate-limit-reset' : str(reset) }
+
+
+class TestRateLimiter():
+    def test_resource_name(self):
+        assert resource_name(FRIENDS_IDS + '?user_id=1&cursor=-1') == '/friends/ids'
+        assert resource_name(STATUSES_RETWEET + '123.json?trim_user=1') == '/statuses/retweet/:id'
+
+    def test_raise_before_doomed_request(self):
+        limiter = RateLimiter(policy='raise', clock=Clock(1000))
+        assert limiter.reserve('/friends/ids') == 0
+        limiter.update('/friends/ids', headers(15, 1, 1900))
+        assert limiter.reserve('/friends/ids') == 0
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            limiter.reserve('/friends/ids')
+        assert isinstance(excinfo.value, TwitterError)
+        assert excinfo.value.error_code == 88
+        assert limiter.status()['resources']['friends']['/friends/ids']['remaining'] == 0
+
+    def test_wait_until_window_resets(self):
+        clock = Clock(1000)
+        limiter = RateLimiter(policy='wait', margin=1, clock=clock)
+        limiter.update('/users/show/:id', headers(900, 0, 1060))
+        assert limiter.reserve('/users/show/:id') == 61
+        clock.now = 1061
+        assert limiter.reserve('/users/show/:id') == 0
+        assert limiter.remaining('/users/show/:id') == 899
+
+    def test_429_empties_bucket(self):
+        limiter = RateLimiter(policy='raise', clock=Clock(1000))
+        limiter.update('/search/tweets', {}, 429)
+        with pytest.raises(RateLimitExceeded):
+            limiter.reserve('/search/tweets')
+        limiter.clock.now = 1000 + 15 * 60
+        assert limiter.reserve('/search/tweets') == 0
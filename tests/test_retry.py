@@ -0,0 +1,52 @@
+import pytest
+
+from birbapi.birbapi import Twitter, TwitterError
+from birbapi.retry import RetryPolicy
+from test_birbapi import make_response
+
+
+def no_sleep(monkeypatch):
+    monkeypatch.setattr('birbapi.birbapi.time.sleep', lambda seconds: None)
+
+
+class TestRetryPolicy():
+    def test_backoff_grows_and_gives_up(self):
+        policy = RetryPolicy(max_attempts=4, backoff=1, jitter=False)
+        assert [policy.next_delay(n, True, 503) for n in range(4)] == [1, 2, 4, None]
+        assert policy.stats() == { 'retries' : 3, 'give_ups' : 1 }
+        assert policy.next_delay(0, True, 404) is None
+        assert policy.stats()['give_ups'] == 1
+
+    def test_respects_retry_after_and_max_delay(self):
+        policy = RetryPolicy(backoff=1, jitter=False, max_delay=60, clock=lambda: 1000)
+        assert policy.next_delay(0, True, 503, { 'Retry-After' : '7' }) == 7
+        limited = { 'x-rate-limit-remaining' : '0', 'x-rate-limit-reset' : '1900' }
+        assert policy.next_delay(0, True, 429, limited) is None
+
+    def test_non_idempotent_only_retried_when_unsent(self):
+        policy = RetryPolicy(jitter=False)
+        assert policy.next_delay(0, False, 503) is None
+        assert policy.next_delay(0, False, sent=True) is None
+        assert policy.next_delay(0, False, sent=False) is not None
+        assert policy.next_delay(0, False, 429) is not None
+
+    def test_client_retries_reads_but_not_tweets(self, monkeypatch):
+        no_sleep(monkeypatch)
+        replies = []
+
+        def send(request, **kwargs):
+            replies.append(request.url)
+            if len(replies) == 1:
+                return make_response({ 'errors' : [{ 'code' : 130, 'message' : 'Over capacity' }] }, 503)
+            return make_response({ 'id' : 1 })
+
+        twitter = Twitter('key', 'secret', retry=RetryPolicy(jitter=False))
+        twitter.session.send = send
+        assert twitter.users_show(1).json() == { 'id' : 1 }
+        assert len(replies) == 2
+
+        replies.clear()
+        with pytest.raises(TwitterError) as excinfo:
+            twitter.send_tweet('hello')
+        assert excinfo.value.error_code == 130
+        assert len(replies) == 1
@@ -0,0 +1,45 @@
+from urllib.parse import urlparse, parse_qs
+
+from birbapi.birbapi import Twitter
+from birbapi.search import SearchWatermarks
+from test_birbapi import make_response
+
+
+class FakeSearch():
+    """ Serves search/tweets over a fixed set of tweet IDs, newest first """
+    def __init__(self, ids, count=3):
+        self.ids = sorted(ids, reverse=True)
+        self.count = count
+        self.queries = []
+
+    def __call__(self, request, **kwargs):
+        query = { key : int(value[0]) for key, value in parse_qs(urlparse(request.url).query).items()
+                if key in ('since_id', 'max_id') }
+        self.queries.append(query)
+        ids = [i for i in self.ids if i > query.get('since_id', 0) and i <= query.get('max_id', i)]
+        return make_response({ 'statuses' : [{ 'id' : i } for i in ids[:self.count]] })
+
+
+class TestSearch():
+    def test_walks_max_id_and_tracks_watermark(self, tmp_path):
+        path = str(tmp_path / 'watermarks.json')
+        twitter = Twitter('key', 'secret')
+        twitter.session.send = fake = FakeSearch(range(1, 8))
+
+        pages = list(twitter.iter_search('birbs', watermarks=SearchWatermarks(path)))
+        assert [[status['id'] for status in page] for page in pages] == [[7, 6, 5], [4, 3, 2], [1]]
+        assert fake.queries[1] == { 'max_id' : 4 }
+
+        # a new process picks up where the last one left off
+        fake.ids = list(range(10, 0, -1))
+        pages = list(twitter.iter_search('birbs', watermarks=SearchWatermarks(path)))
+        assert [[status['id'] for status in page] for page in pages] == [[10, 9, 8]]
+        assert fake.queries[-1] == { 'since_id' : 7, 'max_id' : 7 }
+        assert SearchWatermarks(path).get('birbs') == 10
+
+    def test_partial_walk_keeps_watermark(self):
+        watermarks = SearchWatermarks()
+        twitter = Twitter('key', 'secret')
+        twitter.session.send = FakeSearch(range(1, 8))
+        assert len(list(twitter.iter_search('birbs', watermarks=watermarks, max_pages=1))) == 1
+        assert watermarks.get('birbs') is None